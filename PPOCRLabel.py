@@ -21,65 +21,71 @@ import os
 import platform
 import subprocess
 import sys
-import traceback
 from functools import partial
 
-import openpyxl
-import cv2
-import numpy as np
-
-from PyQt5.QtCore import (
-    QSize,
-    Qt,
-    QPoint,
-    QByteArray,
-    QTimer,
-    QFileInfo,
-    QPointF,
-    QProcess,
-)
-from PyQt5.QtGui import (
-    QImage,
-    QCursor,
-    QPixmap,
-    QImageReader,
-    QColor,
-    QIcon,
-    QFontDatabase,
-)
-from PyQt5.QtWidgets import (
-    QMainWindow,
-    QListWidget,
-    QVBoxLayout,
-    QToolButton,
-    QHBoxLayout,
-    QDockWidget,
-    QWidget,
-    QSlider,
-    QGraphicsOpacityEffect,
-    QMessageBox,
-    QListView,
-    QScrollArea,
-    QWidgetAction,
-    QApplication,
-    QLabel,
-    QGridLayout,
-    QFileDialog,
-    QListWidgetItem,
-    QComboBox,
-    QDialog,
-    QAbstractItemView,
-    QMenu,
-    QAction,
-    QPushButton,
-)
-
 __dir__ = os.path.dirname(__file__)
 sys.path.append(os.path.join(__dir__, ""))
 
-from paddleocr import PaddleOCR, PPStructure
-import libs.resources
-from libs.resources import *
+from libs.startupTrace import trace
+
+with trace.phase("import openpyxl"):
+    import openpyxl
+with trace.phase("import cv2"):
+    import cv2
+with trace.phase("import numpy"):
+    import numpy as np
+
+with trace.phase("import PyQt5"):
+    from PyQt5.QtCore import (
+        QSize,
+        Qt,
+        QPoint,
+        QByteArray,
+        QTimer,
+        QFileInfo,
+        QPointF,
+        QProcess,
+        QThread,
+    )
+    from PyQt5.QtGui import (
+        QImage,
+        QCursor,
+        QPixmap,
+        QColor,
+        QIcon,
+        QFontDatabase,
+    )
+    from PyQt5.QtWidgets import (
+        QMainWindow,
+        QListWidget,
+        QVBoxLayout,
+        QToolButton,
+        QHBoxLayout,
+        QDockWidget,
+        QWidget,
+        QSlider,
+        QGraphicsOpacityEffect,
+        QMessageBox,
+        QListView,
+        QScrollArea,
+        QWidgetAction,
+        QApplication,
+        QLabel,
+        QGridLayout,
+        QFileDialog,
+        QListWidgetItem,
+        QComboBox,
+        QDialog,
+        QAbstractItemView,
+        QMenu,
+        QAction,
+        QPushButton,
+        QProgressDialog,
+    )
+
+with trace.phase("import libs.resources"):
+    import libs.resources
+    from libs.resources import *
 from libs.constants import (
     SETTING_ADVANCE_MODE,
     SETTING_DRAW_SQUARE,
@@ -103,8 +109,8 @@ from libs.utils import (
     fmtShortcut,
     get_rotate_crop_image,
     have_qstring,
+    recognize_crops,
     keysInfo,
-    natural_sort,
     newAction,
     newIcon,
     rebuild_html_from_ppstructure_label,
@@ -117,20 +123,54 @@ from libs.labelColor import label_colormap
 from libs.settings import Settings
 from libs.shape import Shape, DEFAULT_LINE_COLOR, DEFAULT_FILL_COLOR, DEFAULT_LOCK_COLOR
 from libs.stringBundle import StringBundle
+from libs.thumbnails import ThumbnailService
 from libs.canvas import Canvas
 from libs.zoomWidget import ZoomWidget
 from libs.autoDialog import AutoDialog
+from libs.autoRecEngine import RunJournal, resultToLabels
 from libs.labelDialog import LabelDialog
 from libs.colorDialog import ColorDialog
+from libs.cropExport import CropExport
 from libs.ustr import ustr
 from libs.hashableQListWidgetItem import HashableQListWidgetItem
 from libs.editinlist import EditInList
 from libs.unique_label_qlist_widget import UniqueLabelQListWidget
 from libs.keyDialog import KeyDialog
-from libs.baiduCloudOcr import BaiduCloudOCR
+from libs.dirScanner import DirScanner, imageExtensions
+from libs.fileListModel import FileListModel
+from libs.geometry import cropImages, minAreaQuads, quadBoxes
+from libs.imageCache import ImageCache
+from libs.imageFolder import imageLabelIdx, iterImages, keepListing, sortImages
+from libs.imageList import ImageList
+from libs.imagePyramid import canvasPixmap
+from libs.labelStore import (
+    LabelJournal,
+    appendLabels,
+    loadLabelFile,
+    saveFileState,
+)
+from libs.metrics import metrics
+from libs.metricsDock import MetricsDock
+from libs.lazyModel import (
+    LazyModel,
+    buildBaiduCloudOCR,
+    buildPaddleOCR,
+    buildPPStructure,
+)
+
+trace.mark("modules imported")
 
 __appname__ = "PPOCRLabel"
 
+# milliseconds without a confirmed image before the label journal is compacted
+COMPACT_IDLE_MS = 30000
+COMPACT_IDLE_MS_AUTOSAVE = 2000
+
+# decoded images kept for next/prev navigation
+IMAGE_CACHE_BYTES = 1 << 30
+PREFETCH_AHEAD = 3
+PREFETCH_BEHIND = 1
+
 LABEL_COLORMAP = label_colormap()
 
 
@@ -153,6 +193,10 @@ class MainWindow(QMainWindow):
         cls_model_dir=None,
         label_font_path=None,
         selected_shape_color=(255, 255, 0),
+        auto_rec_workers=1,
+        auto_decode_workers=2,
+        crop_export_workers=None,
+        preload_models=True,
     ):
         super(MainWindow, self).__init__()
         self.setWindowTitle(__appname__)
@@ -161,19 +205,24 @@ class MainWindow(QMainWindow):
 
         # Load setting in the main thread
         self.settings = Settings()
-        self.settings.load()
+        with trace.phase("Settings.load"):
+            self.settings.load()
         settings = self.settings
         self.lang = lang
         self.gpu = gpu
         self.img_list_natural_sort = img_list_natural_sort
         self.bbox_auto_zoom_center = bbox_auto_zoom_center
+        self.auto_rec_workers = auto_rec_workers
+        self.auto_decode_workers = auto_decode_workers
+        self.crop_export_workers = crop_export_workers
 
         # Load string bundle for i18n
         if lang not in ["ch", "en"]:
             lang = "en"
-        self.stringBundle = StringBundle.getBundle(
-            localeStr="zh-CN" if lang == "ch" else "en"
-        )  # 'en'
+        with trace.phase("StringBundle.getBundle"):
+            self.stringBundle = StringBundle.getBundle(
+                localeStr="zh-CN" if lang == "ch" else "en"
+            )  # 'en'
 
         def getStr(strId):
             return self.stringBundle.getString(strId)
@@ -205,20 +254,31 @@ class MainWindow(QMainWindow):
         if cls_model_dir is not None:
             params["cls_model_dir"] = cls_model_dir
 
-        self.ocr = PaddleOCR(**params)
-        self.table_ocr = PPStructure(
-            use_pdserving=False, use_gpu=gpu, lang=lang, layout=False, show_log=False
-        )
-        self.baiduOcr = BaiduCloudOCR()
-
-        if os.path.exists("./data/paddle.png"):
-            result = self.ocr.ocr("./data/paddle.png", cls=True, det=True)
-            result = self.table_ocr(
-                "./data/paddle.png", return_ocr_result_in_table=True
+        # kept to build more model instances for parallel auto recognition
+        self.ocrParams = params
+        # paddle is imported and the models built in the background, the
+        # window is usable meanwhile, only recognition waits for them
+        warmup = "./data/paddle.png" if os.path.exists("./data/paddle.png") else None
+        self.ocrModel = LazyModel(partial(buildPaddleOCR, params, warmup))
+        self.tableModel = LazyModel(
+            partial(
+                buildPPStructure,
+                {
+                    "use_pdserving": False,
+                    "use_gpu": gpu,
+                    "lang": lang,
+                    "layout": False,
+                    "show_log": False,
+                },
+                warmup,
             )
+        )
+        self.baiduModel = LazyModel(buildBaiduCloudOCR)
+        if preload_models:
+            self.ocrModel.preload()
 
         # For loading all image under a directory
-        self.mImgList = []
+        self.mImgList = ImageList()
         self.mImgList5 = []
         self.dirname = None
         self.labelHist = []
@@ -253,7 +313,20 @@ class MainWindow(QMainWindow):
         self.noLabelText = getStr("nullLabel")
         self.model = "paddle"
         self.PPreader = None
-        self.autoSaveNum = 5
+        # confirmed labels are appended here and folded into Label.txt when idle
+        self.labelJournal = None
+        self.autoRunJournal = None
+        self.dirScanner = None
+        self.imageCache = ImageCache(maxBytes=IMAGE_CACHE_BYTES)
+        self.thumbnails = ThumbnailService(parent=self)
+        self.thumbnails.thumbnailReady.connect(self.setThumbnail)
+        # image path -> its item in the icon strip
+        self.iconItems = {}
+        # BGR pixels of the current image, self.image shares this buffer
+        self.cvImage = None
+        self.compactTimer = QTimer(self)
+        self.compactTimer.setSingleShot(True)
+        self.compactTimer.timeout.connect(partial(self.compactLabels, True))
 
         self.useBaiduOcr = False
 
@@ -262,10 +335,14 @@ class MainWindow(QMainWindow):
         filelistLayout = QVBoxLayout()
         filelistLayout.setContentsMargins(0, 0, 0, 0)
 
-        self.fileListWidget = QListWidget()
-        self.fileListWidget.itemClicked.connect(self.fileitemDoubleClicked)
-        self.fileListWidget.setIconSize(QSize(25, 25))
-        filelistLayout.addWidget(self.fileListWidget)
+        self.fileListModel = FileListModel(isDone=self.validFilestate, parent=self)
+        self.fileListView = QListView()
+        self.fileListView.setModel(self.fileListModel)
+        # all rows have the same height, lets the view skip measuring them
+        self.fileListView.setUniformItemSizes(True)
+        self.fileListView.clicked.connect(self.fileitemDoubleClicked)
+        self.fileListView.setIconSize(QSize(25, 25))
+        filelistLayout.addWidget(self.fileListView)
 
         fileListContainer = QWidget()
         fileListContainer.setLayout(filelistLayout)
@@ -441,6 +518,11 @@ class MainWindow(QMainWindow):
         self.imageSliderDock.setAttribute(Qt.WA_TranslucentBackground)
         self.addDockWidget(Qt.RightDockWidgetArea, self.imageSliderDock)
 
+        # latency of the hot paths, opened from the View menu
+        self.metricsDock = MetricsDock("Metrics", self)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.metricsDock)
+        self.metricsDock.hide()
+
         self.zoomWidget = ZoomWidget()
         self.colorDialog = ColorDialog(parent=self)
         self.zoomWidgetValue = self.zoomWidget.value()
@@ -1128,6 +1210,8 @@ class MainWindow(QMainWindow):
                 None,
                 fitWindow,
                 fitWidth,
+                None,
+                self.metricsDock.toggleViewAction(),
             ),
         )
 
@@ -1364,10 +1448,14 @@ class MainWindow(QMainWindow):
 
     def rotateImg(self, filename, k, _value):
         self.actions.rotateRight.setEnabled(_value)
-        pix = cv2.imdecode(np.fromfile(filename, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if filename == self.filePath:
+            pix = self.currentImage()
+        else:
+            pix = cv2.imdecode(np.fromfile(filename, dtype=np.uint8), cv2.IMREAD_COLOR)
         pix = np.rot90(pix, k)
         ext = os.path.splitext(filename)[1]
         cv2.imencode(ext, pix)[1].tofile(filename)
+        self.imageCache.invalidate(filename)
         self.canvas.update()
         self.loadFile(filename)
 
@@ -1539,10 +1627,8 @@ class MainWindow(QMainWindow):
             return self.mImgList[currIndex - 2 : currIndex + 3]
 
     # Tzutalin 20160906 : Add file list and dock to move faster
-    def fileitemDoubleClicked(self, item=None):
-        self.currIndex = self.mImgList.index(
-            ustr(os.path.join(os.path.abspath(self.dirname), item.text()))
-        )
+    def fileitemDoubleClicked(self, index=None):
+        self.currIndex = index.row()
         filename = self.mImgList[self.currIndex]
         if filename:
             self.mImgList5 = self.indexTo5Files(self.currIndex)
@@ -1672,6 +1758,7 @@ class MainWindow(QMainWindow):
             self.updateComboBox()
         self.updateIndexList()
 
+    @metrics.timed("loadLabels")
     def loadLabels(self, shapes):
         s = []
         shape_index = 0
@@ -2062,6 +2149,7 @@ class MainWindow(QMainWindow):
         for item, shape in self.itemsToShapes.items():
             self.canvas.setShapeVisible(shape, value)
 
+    @metrics.timed("loadFile")
     def loadFile(self, filePath=None, isAdjustScale=True):
         """Load the specified file, or the last opened file if None."""
         self.canvas.shape_move_index = None
@@ -2080,39 +2168,39 @@ class MainWindow(QMainWindow):
         # Tzutalin 20160906 : Add file list and dock to move faster
         # Highlight the file item
 
-        if unicodeFilePath and self.fileListWidget.count() > 0:
-            if unicodeFilePath in self.mImgList:
-                index = self.mImgList.index(unicodeFilePath)
-                fileWidgetItem = self.fileListWidget.item(index)
-                print("unicodeFilePath is", unicodeFilePath)
-                fileWidgetItem.setSelected(True)
-                self.iconlist.clear()
-                self.additems5(None)
-
-                for i in range(5):
-                    item_tooltip = self.iconlist.item(i).toolTip()
-                    # print(i,"---",item_tooltip)
-                    if item_tooltip == ustr(filePath):
-                        titem = self.iconlist.item(i)
+        if unicodeFilePath and self.fileListModel.rowCount() > 0:
+            with metrics.timed("loadFile.fileList"):
+                if unicodeFilePath in self.mImgList:
+                    index = self.mImgList.index(unicodeFilePath)
+                    print("unicodeFilePath is", unicodeFilePath)
+                    self.fileListView.setCurrentIndex(self.fileListModel.index(index))
+                    self.additems5(None)
+
+                    titem = self.iconItems.get(unicodeFilePath)
+                    if titem is not None:
+                        self.iconlist.clearSelection()
                         titem.setSelected(True)
                         self.iconlist.scrollToItem(titem)
-                        break
-            else:
-                self.fileListWidget.clear()
-                self.mImgList.clear()
-                self.iconlist.clear()
+                else:
+                    self.mImgList.clear()
+                    self.fileListModel.setImages(self.mImgList)
+                    self.clearIconList()
 
         # if unicodeFilePath and self.iconList.count() > 0:
         #     if unicodeFilePath in self.mImgList:
 
         if unicodeFilePath and os.path.exists(unicodeFilePath):
             self.canvas.verified = False
-            cvimg = cv2.imdecode(np.fromfile(unicodeFilePath, dtype=np.uint8), 1)
-            height, width, depth = cvimg.shape
-            cvimg = cv2.cvtColor(cvimg, cv2.COLOR_BGR2RGB)
-            image = QImage(
-                cvimg.data, width, height, width * depth, QImage.Format_RGB888
-            )
+            with metrics.timed("loadFile.decode"):
+                cvimg = self.imageCache.get(unicodeFilePath)
+            if cvimg is not None:
+                height, width, depth = cvimg.shape
+                # Qt reads the BGR buffer directly, no colour conversion needed
+                image = QImage(
+                    cvimg.data, width, height, width * depth, QImage.Format_BGR888
+                )
+            else:
+                image = QImage()
 
             if image.isNull():
                 self.errorMessage(
@@ -2123,8 +2211,12 @@ class MainWindow(QMainWindow):
                 return False
             self.status("Loaded %s" % os.path.basename(unicodeFilePath))
             self.image = image
+            self.cvImage = cvimg
             self.filePath = unicodeFilePath
-            self.canvas.loadPixmap(QPixmap.fromImage(image))
+            self.prefetchNeighbours()
+            with metrics.timed("loadFile.pixmap"):
+                # very large scans are drawn from tiles of a mipmap pyramid
+                self.canvas.loadPixmap(canvasPixmap(image, owner=cvimg))
 
             if self.validFilestate(filePath) is True:
                 self.setClean()
@@ -2154,11 +2246,11 @@ class MainWindow(QMainWindow):
                 self.indexList.item(self.labelList.count() - 1).setSelected(True)
 
             # show file list image count
-            select_indexes = self.fileListWidget.selectedIndexes()
+            select_indexes = self.fileListView.selectedIndexes()
             if len(select_indexes) > 0:
                 self.fileDock.setWindowTitle(
                     self.fileListName + f" ({select_indexes[0].row() + 1}"
-                    f"/{self.fileListWidget.count()})"
+                    f"/{self.fileListModel.rowCount()})"
                 )
             # update show counting
             self.BoxListDock.setWindowTitle(
@@ -2186,6 +2278,28 @@ class MainWindow(QMainWindow):
             return True
         return False
 
+    def currentImage(self):
+        """BGR pixels of the open image, shared with the canvas. Do not modify in place."""
+        if self.cvImage is None and self.filePath:
+            self.cvImage = self.imageCache.get(self.filePath)
+        return self.cvImage
+
+    def prefetchNeighbours(self):
+        """Decode the images around the current one in the background."""
+        if self.filePath not in self.mImgList:
+            return
+        row = self.mImgList.index(self.filePath)
+        rows = list(range(row + 1, row + 1 + PREFETCH_AHEAD))
+        rows += list(range(row - 1, row - 1 - PREFETCH_BEHIND, -1))
+        self.imageCache.prefetch(
+            [self.mImgList[i] for i in rows if 0 <= i < len(self.mImgList)]
+        )
+        # the icon strip windows one step either way
+        self.thumbnails.prefetch(
+            self.indexTo5Files(max(row - 1, 0)) + self.indexTo5Files(row + 1)
+        )
+
+    @metrics.timed("showBoundingBoxFromPPlabel")
     def showBoundingBoxFromPPlabel(self, filePath):
         width, height = self.image.width(), self.image.height()
         imgidx = self.getImglabelidx(filePath)
@@ -2315,6 +2429,13 @@ class MainWindow(QMainWindow):
                 self.saveLabelFile()
             except Exception:
                 pass
+            if self.labelJournal is not None:
+                self.labelJournal.close()
+            if self.dirScanner is not None:
+                self.dirScanner.cancel()
+                self.dirScanner.wait()
+            self.imageCache.close()
+            self.thumbnails.close()
 
     def loadRecent(self, filename):
         if self.mayContinue():
@@ -2322,22 +2443,8 @@ class MainWindow(QMainWindow):
             self.loadFile(filename)
 
     def scanAllImages(self, folderPath):
-        extensions = [
-            ".%s" % fmt.data().decode("ascii").lower()
-            for fmt in QImageReader.supportedImageFormats()
-        ]
-        images = []
-
-        for file in os.listdir(folderPath):
-            if file.lower().endswith(tuple(extensions)):
-                relativePath = os.path.join(folderPath, file)
-                path = ustr(os.path.abspath(relativePath))
-                images.append(path)
-        if self.img_list_natural_sort:
-            natural_sort(images, key=lambda x: x.lower())
-        else:
-            images.sort()
-        return images
+        images = list(iterImages(os.path.abspath(folderPath), imageExtensions()))
+        return sortImages(images, self.img_list_natural_sort)
 
     def openDirDialog(self, _value=False, dirpath=None, silent=False):
         if not self.mayContinue():
@@ -2424,13 +2531,29 @@ class MainWindow(QMainWindow):
             self.saveLabelFile()
 
         if not isDelete:
+            if self.labelJournal is not None:
+                self.labelJournal.close()
+            self.imageCache.clear()
             self.loadFilestate(dirpath)
             self.PPlabelpath = dirpath + "/Label.txt"
             self.PPlabel = self.loadLabelFile(self.PPlabelpath)
             self.Cachelabelpath = dirpath + "/Cache.cach"
             self.Cachelabel = self.loadLabelFile(self.Cachelabelpath)
             if self.Cachelabel:
-                self.PPlabel = dict(self.Cachelabel, **self.PPlabel)
+                merged = self.Cachelabel.copy()
+                merged.update(self.PPlabel)
+                self.PPlabel = merged
+
+            # confirmations that were not compacted before the last exit
+            self.labelJournal = LabelJournal(
+                self.PPlabelpath, guard=partial(keepListing, dirpath)
+            )
+            if self.labelJournal.replay(self.PPlabel, self.fileStatedict):
+                print("Recovered unsaved labels from", self.labelJournal.path)
+                self.actions.saveLabel.setEnabled(True)
+                self.actions.saveRec.setEnabled(True)
+                self.actions.exportJSON.setEnabled(True)
+                self.compactTimer.start(COMPACT_IDLE_MS)
 
             self.init_key_list(self.PPlabel)
 
@@ -2449,22 +2572,48 @@ class MainWindow(QMainWindow):
             imgListCurrIndex = self.mImgList.index(self.filePath)
 
         self.filePath = None
-        self.fileListWidget.clear()
-        self.mImgList = self.scanAllImages(dirpath)
+        # rows are shown unsorted while the folder is read, the sorted list
+        # replaces them in importDirFinished
+        self.mImgList = ImageList()
+        self.mImgList5 = []
+        self.fileListModel.setImages(self.mImgList)
+        self.statusBar().showMessage("Scanning %s ..." % dirpath)
+
+        if self.dirScanner is not None:
+            self.dirScanner.cancel()
+        scanner = DirScanner(dirpath, self.img_list_natural_sort, parent=self)
+        scanner.batchReady.connect(partial(self.importDirBatch, scanner))
+        scanner.scanFinished.connect(
+            partial(self.importDirFinished, scanner, dirpath, imgListCurrIndex)
+        )
+        scanner.finished.connect(scanner.deleteLater)
+        self.dirScanner = scanner
+        scanner.start()
+
+    def importDirBatch(self, scanner, paths):
+        if scanner is not self.dirScanner:
+            return
+        self.fileListModel.appendImages(paths)
+        self.fileDock.setWindowTitle(
+            self.fileListName + f" (0/{self.fileListModel.rowCount()})"
+        )
+
+    def importDirFinished(self, scanner, dirpath, imgListCurrIndex, images):
+        if scanner is not self.dirScanner:
+            return
+        self.fileListModel.setImages([])
+        self.mImgList = ImageList(images)
+        if self.filePath is not None and self.filePath in self.mImgList:
+            # an image was opened from the rows shown during the scan
+            imgListCurrIndex = self.mImgList.index(self.filePath)
+        self.filePath = None
         self.mImgList5 = self.mImgList[:5]
         self.openNextImg(imgListCurrIndex=imgListCurrIndex)
-        doneicon = newIcon("done")
-        closeicon = newIcon("close")
-        for imgPath in self.mImgList:
-            filename = os.path.basename(imgPath)
-            if self.validFilestate(imgPath) is True:
-                item = QListWidgetItem(doneicon, filename)
-            else:
-                item = QListWidgetItem(closeicon, filename)
-            self.fileListWidget.addItem(item)
+        # rows, names and icons are produced lazily by the model
+        self.fileListModel.setImages(self.mImgList)
 
         print("DirPath in importDirImages is", dirpath)
-        self.iconlist.clear()
+        self.clearIconList()
         self.additems5(dirpath)
         self.changeFileFolder = True
         self.haveAutoReced = False
@@ -2481,15 +2630,15 @@ class MainWindow(QMainWindow):
         fileListWidgetCurrentRow = 0
         if imgListCurrIndex is not None:
             fileListWidgetCurrentRow = imgListCurrIndex
-            if fileListWidgetCurrentRow >= self.fileListWidget.count():
+            if fileListWidgetCurrentRow >= self.fileListModel.rowCount():
                 fileListWidgetCurrentRow = fileListWidgetCurrentRow - 1
 
-        self.fileListWidget.setCurrentRow(
-            fileListWidgetCurrentRow
+        self.fileListView.setCurrentIndex(
+            self.fileListModel.index(fileListWidgetCurrentRow)
         )  # set list index to first
         self.fileDock.setWindowTitle(
             self.fileListName
-            + f" ({fileListWidgetCurrentRow+1}/{self.fileListWidget.count()})"
+            + f" ({fileListWidgetCurrentRow+1}/{self.fileListModel.rowCount()})"
         )  # show image count
 
     def openPrevImg(self, _value=False):
@@ -2555,15 +2704,13 @@ class MainWindow(QMainWindow):
                 self.canvas.selectedShapes.remove(s)
                 self.canvas.shapes.remove(s)
 
+    @metrics.timed("_saveFile")
     def _saveFile(self, annotationFilePath, mode="Manual"):
         if len(self.canvas.lockedShapes) != 0:
             self.saveLockedShapes()
 
         if mode == "Manual":
             self.result_dic_locked = []
-            img = cv2.imdecode(
-                np.fromfile(self.filePath, dtype=np.uint8), cv2.IMREAD_COLOR
-            )
             width, height = self.image.width(), self.image.height()
             for shape in self.canvas.lockedShapes:
                 box = [[int(p[0] * width), int(p[1] * height)] for p in shape["ratio"]]
@@ -2578,15 +2725,16 @@ class MainWindow(QMainWindow):
                 self.statusBar().showMessage("Saved to  %s" % annotationFilePath)
                 self.statusBar().show()
                 currIndex = self.mImgList.index(self.filePath)
-                item = self.fileListWidget.item(currIndex)
-                item.setIcon(newIcon("done"))
-
-                self.fileStatedict[self.getImglabelidx(self.filePath)] = 1
-                if len(self.fileStatedict) % self.autoSaveNum == 0:
-                    self.saveFilestate()
-                    self.savePPlabel(mode="Auto")
+                imgidx = self.getImglabelidx(self.filePath)
+                self.fileStatedict[imgidx] = 1
+                self.fileListModel.refreshRow(currIndex)
+                self.labelJournal.append(imgidx, self.PPlabel.get(imgidx, []))
+                self.compactTimer.start(
+                    COMPACT_IDLE_MS_AUTOSAVE
+                    if self.autoSaveOption.isChecked()
+                    else COMPACT_IDLE_MS
+                )
 
-                self.fileListWidget.insertItem(int(currIndex), item)
                 if not self.canvas.isInTheSameImage:
                     self.openNextImg()
                 self.actions.saveRec.setEnabled(True)
@@ -2642,11 +2790,11 @@ class MainWindow(QMainWindow):
                     print(cmd)
                     subprocess.call(cmd, stdout=open(os.devnull, "w"))
 
-                if self.filePath in self.fileStatedict.keys():
-                    self.fileStatedict.pop(self.filePath)
                 imgidx = self.getImglabelidx(self.filePath)
+                self.fileStatedict.pop(imgidx, None)
                 if imgidx in self.PPlabel.keys():
                     self.PPlabel.pop(imgidx)
+                self.labelJournal.remove(imgidx)
 
                 self.importDirImages(self.lastOpenDir, isDelete=True)
 
@@ -2779,23 +2927,48 @@ class MainWindow(QMainWindow):
     def toogleDrawSquare(self):
         self.canvas.setDrawingShapeToSquare(self.drawSquaresOption.isChecked())
 
+    def thumbnailIcon(self, path):
+        """Icon of ``path`` if its thumbnail is ready, else an empty one set later."""
+        image = self.thumbnails.get(path)
+        if image is None:
+            return QIcon()
+        return QIcon(QPixmap.fromImage(image))
+
+    def setThumbnail(self, path, image):
+        item = self.iconItems.get(path)
+        if item is not None:
+            item.setIcon(QIcon(QPixmap.fromImage(image)))
+
+    def clearIconList(self):
+        self.iconlist.clear()
+        self.iconItems = {}
+
     def additems(self, dirpath):
         for file in self.mImgList:
-            pix = QPixmap(file)
             _, filename = os.path.split(file)
             filename, _ = os.path.splitext(filename)
-            item = QListWidgetItem(
-                QIcon(
-                    pix.scaled(100, 100, Qt.IgnoreAspectRatio, Qt.FastTransformation)
-                ),
-                filename[:10],
-            )
+            item = QListWidgetItem(self.thumbnailIcon(file), filename[:10])
             item.setToolTip(file)
             self.iconlist.addItem(item)
+            self.iconItems[file] = item
 
     def additems5(self, dirpath):
-        for file in self.mImgList5:
-            pix = QPixmap(file)
+        """Show mImgList5 in the icon strip.
+
+        The strip slides with the current image: items of images still in the
+        window are moved rather than rebuilt, only new images get an item.
+        """
+        window = list(self.mImgList5)
+        for file in [f for f in self.iconItems if f not in window]:
+            self.iconlist.takeItem(self.iconlist.row(self.iconItems.pop(file)))
+        for row, file in enumerate(window):
+            item = self.iconItems.get(file)
+            if item is not None:
+                if self.iconlist.row(item) != row:
+                    self.iconlist.insertItem(
+                        row, self.iconlist.takeItem(self.iconlist.row(item))
+                    )
+                continue
             _, filename = os.path.split(file)
             filename, _ = os.path.splitext(filename)
             pfilename = filename[:10]
@@ -2804,15 +2977,11 @@ class MainWindow(QMainWindow):
                 prelen = lentoken // 2
                 bfilename = prelen * " " + pfilename + (lentoken - prelen) * " "
             # item = QListWidgetItem(QIcon(pix.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)),filename[:10])
-            item = QListWidgetItem(
-                QIcon(
-                    pix.scaled(100, 100, Qt.IgnoreAspectRatio, Qt.FastTransformation)
-                ),
-                pfilename,
-            )
+            item = QListWidgetItem(self.thumbnailIcon(file), pfilename)
             # item.setForeground(QBrush(Qt.white))
             item.setToolTip(file)
-            self.iconlist.addItem(item)
+            self.iconlist.insertItem(row, item)
+            self.iconItems[file] = item
         owidth = 0
         for index in range(len(self.mImgList5)):
             item = self.iconlist.item(index)
@@ -2824,71 +2993,107 @@ class MainWindow(QMainWindow):
         """
         Generate min area quad from poly.
         """
-        point_num = poly.shape[0]
-        min_area_quad = np.zeros((4, 2), dtype=np.float32)
-        rect = cv2.minAreaRect(
-            poly.astype(np.int32)
-        )  # (center (x,y), (width, height), angle of rotation)
-        box = np.array(cv2.boxPoints(rect))
-
-        first_point_idx = 0
-        min_dist = 1e4
-        for i in range(4):
-            dist = (
-                np.linalg.norm(box[(i + 0) % 4] - poly[0])
-                + np.linalg.norm(box[(i + 1) % 4] - poly[point_num // 2 - 1])
-                + np.linalg.norm(box[(i + 2) % 4] - poly[point_num // 2])
-                + np.linalg.norm(box[(i + 3) % 4] - poly[-1])
-            )
-            if dist < min_dist:
-                min_dist = dist
-                first_point_idx = i
-        for i in range(4):
-            min_area_quad[i] = box[(first_point_idx + i) % 4]
+        return minAreaQuads([poly])[0]
 
-        bbox_new = min_area_quad.tolist()
-        bbox = []
+    def getImglabelidx(self, filePath):
+        return imageLabelIdx(filePath)
+
+    def loadModel(self, model):
+        """Return the model held by a LazyModel, building it now if needed."""
+        if model.loaded() or QThread.currentThread() is not self.thread():
+            return model.get()
+        self.statusBar().showMessage("Loading the model, please wait...")
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            return model.get()
+        finally:
+            QApplication.restoreOverrideCursor()
+            self.statusBar().clearMessage()
 
-        for box in bbox_new:
-            box = list(map(int, box))
-            bbox.append(box)
+    @property
+    def ocr(self):
+        return self.loadModel(self.ocrModel)
 
-        return bbox
+    @property
+    def table_ocr(self):
+        return self.loadModel(self.tableModel)
 
-    def getImglabelidx(self, filePath):
-        if platform.system() == "Windows":
-            spliter = "\\"
-        else:
-            spliter = "/"
-        filepathsplit = filePath.split(spliter)[-2:]
-        if len(filepathsplit) == 1:
-            return filePath
-        return filepathsplit[0] + "/" + filepathsplit[1]
+    @property
+    def baiduOcr(self):
+        return self.loadModel(self.baiduModel)
 
     def get_ocr(self):
         return self.baiduOcr if self.useBaiduOcr else self.ocr
 
+    def commitAutoResults(self, records):
+        """Store ``(path, boxes)`` records of auto recognition, on the GUI thread."""
+        items = []
+        for path, result in records:
+            if not result:
+                continue
+            imgidx = self.getImglabelidx(path)
+            labels = resultToLabels(result, self.kie_mode)
+            self.PPlabel[imgidx] = labels
+            self.Cachelabel[imgidx] = labels
+            items.append((imgidx, labels))
+        # checkpoint: results first, then the images they cover
+        with keepListing(os.path.dirname(self.Cachelabelpath)):
+            if items:
+                appendLabels(self.Cachelabelpath, items)
+            self.autoRunJournal.record(
+                [self.getImglabelidx(path) for path, _ in records]
+            )
+        self.statusBar().showMessage(
+            "Auto recognition saved %d images to the cache" % len(items)
+        )
+
+    def newOcrModel(self, index):
+        """Model of auto recognition worker ``index``, the first one reuses self.ocr."""
+        if index == 0 or self.useBaiduOcr:
+            return self.get_ocr()
+        return buildPaddleOCR(self.ocrParams)
+
     def autoRecognition(self):
         assert self.mImgList is not None
         print("Using model from ", self.model)
 
-        uncheckedList = [i for i in self.mImgList if i not in self.fileStatedict.keys()]
+        self.autoRunJournal = RunJournal(self.Cachelabelpath)
+        done = self.autoRunJournal.done()
+        if done:
+            print("Resuming auto recognition, %d images already done" % len(done))
+        uncheckedList = [
+            i
+            for i in self.mImgList
+            if self.getImglabelidx(i) not in self.fileStatedict
+            and self.getImglabelidx(i) not in done
+        ]
         self.autoDialog = AutoDialog(
-            parent=self, ocr=self.get_ocr(), mImgList=uncheckedList, lenbar=len(uncheckedList)
+            parent=self,
+            ocr=self.get_ocr(),
+            mImgList=uncheckedList,
+            lenbar=len(uncheckedList),
+            modelFactory=self.newOcrModel,
+            inferWorkers=self.auto_rec_workers,
+            decodeWorkers=self.auto_decode_workers,
         )
         self.autoDialog.popUp()
         self.currIndex = len(self.mImgList) - 1
         self.loadFile(self.filePath)  # ADD
-        self.haveAutoReced = True
-        self.AutoRecognition.setEnabled(False)
-        self.actions.AutoRec.setEnabled(False)
-        self.setDirty()
         self.saveCacheLabel()
+        if self.autoDialog.completed:
+            self.autoRunJournal.finish()
+            self.haveAutoReced = True
+            self.AutoRecognition.setEnabled(False)
+            self.actions.AutoRec.setEnabled(False)
+        else:
+            # a cancelled run continues where it stopped next time
+            self.autoRunJournal.close()
+        self.setDirty()
 
         self.init_key_list(self.Cachelabel)
 
     def reRecognition(self):
-        img = cv2.imdecode(np.fromfile(self.filePath, dtype=np.uint8), 1)
+        img = self.currentImage()
         # org_box = [dic['points'] for dic in self.PPlabel[self.getImglabelidx(self.filePath)]]
         if self.canvas.shapes:
             self.result_dic = []
@@ -2896,24 +3101,25 @@ class MainWindow(QMainWindow):
                 []
             )  # result_dic_locked stores the ocr result of self.canvas.lockedShapes
             rec_flag = 0
-            for shape in self.canvas.shapes:
-                box = [[int(p.x()), int(p.y())] for p in shape.points]
-                kie_cls = shape.key_cls
-
-                if len(box) > 4:
-                    box = self.gen_quad_from_poly(np.array(box))
-                assert len(box) == 4
+            boxes = quadBoxes(
+                [[int(p.x()), int(p.y())] for p in shape.points]
+                for shape in self.canvas.shapes
+            )
+            crops = cropImages(img, np.array(boxes, np.float32))
+            if any(img_crop is None for img_crop in crops):
+                msg = (
+                    "Can not recognise the detection box in "
+                    + self.filePath
+                    + ". Please change manually"
+                )
+                QMessageBox.information(self, "Information", msg)
+                return
 
-                img_crop = get_rotate_crop_image(img, np.array(box, np.float32))
-                if img_crop is None:
-                    msg = (
-                        "Can not recognise the detection box in "
-                        + self.filePath
-                        + ". Please change manually"
-                    )
-                    QMessageBox.information(self, "Information", msg)
-                    return
-                result = self.ocr.ocr(img_crop, cls=True, det=False)[0]
+            # all boxes go through the recognizer in a few batched calls
+            recs = recognize_crops(self.ocr, crops)
+            for shape, box, rec in zip(self.canvas.shapes, boxes, recs):
+                kie_cls = shape.key_cls
+                result = [rec]
                 if result[0][0] != "":
                     if shape.line_color == DEFAULT_LOCK_COLOR:
                         shape.label = result[0][0]
@@ -2969,22 +3175,23 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "Information", "Draw a box!")
 
     def singleRerecognition(self):
-        img = cv2.imdecode(np.fromfile(self.filePath, dtype=np.uint8), 1)
-        for shape in self.canvas.selectedShapes:
-            box = [[int(p.x()), int(p.y())] for p in shape.points]
-            if len(box) > 4:
-                box = self.gen_quad_from_poly(np.array(box))
-            assert len(box) == 4
-            img_crop = get_rotate_crop_image(img, np.array(box, np.float32))
-            if img_crop is None:
-                msg = (
-                    "Can not recognise the detection box in "
-                    + self.filePath
-                    + ". Please change manually"
-                )
-                QMessageBox.information(self, "Information", msg)
-                return
-            result = self.ocr.ocr(img_crop, cls=True, det=False)[0]
+        img = self.currentImage()
+        shapes = list(self.canvas.selectedShapes)
+        boxes = quadBoxes(
+            [[int(p.x()), int(p.y())] for p in shape.points] for shape in shapes
+        )
+        crops = cropImages(img, np.array(boxes, np.float32))
+        if any(img_crop is None for img_crop in crops):
+            msg = (
+                "Can not recognise the detection box in "
+                + self.filePath
+                + ". Please change manually"
+            )
+            QMessageBox.information(self, "Information", msg)
+            return
+
+        for shape, box, rec in zip(shapes, boxes, recognize_crops(self.ocr, crops)):
+            result = [rec]
             if result[0][0] != "":
                 result.insert(0, box)
                 print("result in reRec is ", result)
@@ -3010,11 +3217,14 @@ class MainWindow(QMainWindow):
         import time
 
         start = time.time()
-        img = cv2.imdecode(np.fromfile(self.filePath, dtype=np.uint8), cv2.IMREAD_COLOR)
-        res = self.table_ocr(img, return_ocr_result_in_table=True)
+        img = self.currentImage()
+        table_ocr = self.table_ocr
+        with metrics.timed("ocr.table"):
+            res = table_ocr(img, return_ocr_result_in_table=True)
 
         TableRec_excel_dir = self.lastOpenDir + "/tableRec_excel_output/"
-        os.makedirs(TableRec_excel_dir, exist_ok=True)
+        with keepListing(self.lastOpenDir):
+            os.makedirs(TableRec_excel_dir, exist_ok=True)
         filename, _ = os.path.splitext(os.path.basename(self.filePath))
 
         excel_path = TableRec_excel_dir + "{}.xlsx".format(filename)
@@ -3141,7 +3351,8 @@ class MainWindow(QMainWindow):
         """
         re-recognise text in a cell
         """
-        img = cv2.imdecode(np.fromfile(self.filePath, dtype=np.uint8), cv2.IMREAD_COLOR)
+        img = self.currentImage()
+        ocr = self.ocr
         for shape in self.canvas.selectedShapes:
             box = [[int(p.x()), int(p.y())] for p in shape.points]
 
@@ -3164,12 +3375,14 @@ class MainWindow(QMainWindow):
             # merge the text result in the cell
             texts = ""
             probs = 0.0  # the probability of the cell is avgerage prob of every text box in the cell
-            bboxes = self.ocr.ocr(img_crop, det=True, rec=False, cls=False)[0]
+            with metrics.timed("ocr.det"):
+                bboxes = ocr.ocr(img_crop, det=True, rec=False, cls=False)[0]
             if len(bboxes) > 0:
                 bboxes.reverse()  # top row text at first
                 for _bbox in bboxes:
                     patch = get_rotate_crop_image(img_crop, np.array(_bbox, np.float32))
-                    rec_res = self.ocr.ocr(patch, det=False, rec=True, cls=False)[0]
+                    with metrics.timed("ocr.rec"):
+                        rec_res = ocr.ocr(patch, det=False, rec=True, cls=False)[0]
                     text = rec_res[0][0]
                     if text != "":
                         texts += text + (
@@ -3201,33 +3414,22 @@ class MainWindow(QMainWindow):
         """
 
         # automatically save annotations
-        self.saveFilestate()
         self.savePPlabel(mode="auto")
 
         # load box annotations
-        labeldict = {}
         if not os.path.exists(self.PPlabelpath):
             msg = "ERROR, Can not find Label.txt"
             QMessageBox.information(self, "Information", msg)
             return
         else:
-            with open(self.PPlabelpath, "r", encoding="utf-8") as f:
-                data = f.readlines()
-                for each in data:
-                    file, label = each.split("\t")
-                    if label:
-                        label = label.replace("false", "False")
-                        label = label.replace("true", "True")
-                        label = label.replace("null", "None")
-                        labeldict[file] = eval(label)
-                    else:
-                        labeldict[file] = []
+            labeldict = loadLabelFile(self.PPlabelpath)
 
         # read table recognition output
         TableRec_excel_dir = os.path.join(self.lastOpenDir, "tableRec_excel_output")
 
         # save txt
-        fid = open("{}/gt.txt".format(self.lastOpenDir), "w", encoding="utf-8")
+        with keepListing(self.lastOpenDir):
+            fid = open("{}/gt.txt".format(self.lastOpenDir), "w", encoding="utf-8")
         for image_path in labeldict.keys():
             # load csv annotations
             filename, _ = os.path.splitext(os.path.basename(image_path))
@@ -3319,25 +3521,28 @@ class MainWindow(QMainWindow):
         }
         if current_text in lg_idx:
             choose_lang = lg_idx[current_text]
-            if hasattr(self, "ocr"):
-                del self.ocr
-            self.ocr = PaddleOCR(
-                use_pdserving=False,
-                use_angle_cls=True,
-                det=True,
-                cls=True,
-                use_gpu=self.gpu,
-                lang=choose_lang,
-            )
+            self.ocrParams = {
+                "use_pdserving": False,
+                "use_angle_cls": True,
+                "det": True,
+                "cls": True,
+                "use_gpu": self.gpu,
+                "lang": choose_lang,
+            }
+            self.ocrModel = LazyModel(partial(buildPaddleOCR, self.ocrParams))
+            self.ocrModel.preload()
             if choose_lang in ["ch", "en"]:
-                if hasattr(self, "table_ocr"):
-                    del self.table_ocr
-                self.table_ocr = PPStructure(
-                    use_pdserving=False,
-                    use_gpu=self.gpu,
-                    lang=choose_lang,
-                    layout=False,
-                    show_log=False,
+                self.tableModel = LazyModel(
+                    partial(
+                        buildPPStructure,
+                        {
+                            "use_pdserving": False,
+                            "use_gpu": self.gpu,
+                            "lang": choose_lang,
+                            "layout": False,
+                            "show_log": False,
+                        },
+                    )
                 )
         else:
             print("Invalid language selection")
@@ -3350,7 +3555,8 @@ class MainWindow(QMainWindow):
         self.fileStatepath = saveDir + "/fileState.txt"
         self.fileStatedict = {}
         if not os.path.exists(self.fileStatepath):
-            f = open(self.fileStatepath, "w", encoding="utf-8")
+            with keepListing(saveDir):
+                open(self.fileStatepath, "w", encoding="utf-8").close()
         else:
             with open(self.fileStatepath, "r", encoding="utf-8") as f:
                 states = f.readlines()
@@ -3361,38 +3567,34 @@ class MainWindow(QMainWindow):
                 self.actions.saveRec.setEnabled(True)
                 self.actions.exportJSON.setEnabled(True)
 
-    def saveFilestate(self):
-        with open(self.fileStatepath, "w", encoding="utf-8") as f:
-            for key in self.fileStatedict:
-                f.write(key + "\t")
-                f.write(str(self.fileStatedict[key]) + "\n")
-
     def loadLabelFile(self, labelpath):
-        labeldict = {}
-        if not os.path.exists(labelpath):
-            f = open(labelpath, "w", encoding="utf-8")
+        # entries are parsed lazily, see libs/labelStore.py; it keeps the
+        # folder listing valid when it creates the file or its index
+        return loadLabelFile(labelpath)
 
-        else:
-            with open(labelpath, "r", encoding="utf-8") as f:
-                data = f.readlines()
-                for each in data:
-                    file, label = each.split("\t")
-                    if label:
-                        label = label.replace("false", "False")
-                        label = label.replace("true", "True")
-                        label = label.replace("null", "None")
-                        labeldict[file] = eval(label)
-                    else:
-                        labeldict[file] = []
-        return labeldict
+    def compactLabels(self, background=False):
+        """Rewrite Label.txt and fileState.txt from memory and empty the journal."""
+        if self.labelJournal is None:
+            return
+        self.compactTimer.stop()
+        # snapshot on the GUI thread, the files are written from it
+        states = dict(self.fileStatedict)
+        labels = self.PPlabel.copy()
+        savedfile = {self.getImglabelidx(i) for i in states}
+        keys = [key for key in labels if key in savedfile]
+        fileStatepath, PPlabelpath = self.fileStatepath, self.PPlabelpath
+
+        def writeSnapshot():
+            with keepListing(os.path.dirname(PPlabelpath)):
+                saveFileState(fileStatepath, states)
+                labels.save(PPlabelpath, keys=keys, skipEmpty=True)
+
+        self.labelJournal.compact(writeSnapshot, background=background)
 
     def savePPlabel(self, mode="Manual"):
-        savedfile = [self.getImglabelidx(i) for i in self.fileStatedict.keys()]
-        with open(self.PPlabelpath, "w", encoding="utf-8") as f:
-            for key in self.PPlabel:
-                if key in savedfile and self.PPlabel[key] != []:
-                    f.write(key + "\t")
-                    f.write(json.dumps(self.PPlabel[key], ensure_ascii=False) + "\n")
+        # the message box below waits for the user, keep it out of the span
+        with metrics.timed("savePPlabel"):
+            self.compactLabels()
 
         if mode == "Manual":
             if self.lang == "ch":
@@ -3402,66 +3604,62 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "Information", msg)
 
     def saveCacheLabel(self):
-        with open(self.Cachelabelpath, "w", encoding="utf-8") as f:
-            for key in self.Cachelabel:
-                f.write(key + "\t")
-                f.write(json.dumps(self.Cachelabel[key], ensure_ascii=False) + "\n")
+        with keepListing(os.path.dirname(self.Cachelabelpath)):
+            self.Cachelabel.save(self.Cachelabelpath)
 
     def saveLabelFile(self):
-        self.saveFilestate()
         self.savePPlabel()
 
     def saveRecResult(self):
-        if {} in [self.PPlabelpath, self.PPlabel, self.fileStatedict]:
+        if not self.PPlabelpath or not self.PPlabel or not self.fileStatedict:
             QMessageBox.information(self, "Information", "Check the image first")
             return
 
         base_dir = os.path.dirname(self.PPlabelpath)
-        rec_gt_dir = base_dir + "/rec_gt.txt"
-        crop_img_dir = base_dir + "/crop_img/"
-        ques_img = []
-        if not os.path.exists(crop_img_dir):
-            os.mkdir(crop_img_dir)
-
-        with open(rec_gt_dir, "w", encoding="utf-8") as f:
-            for key in self.fileStatedict:
-                idx = self.getImglabelidx(key)
-                try:
-                    img_path = os.path.dirname(base_dir) + "/" + key
-                    img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), -1)
-                    for i, label in enumerate(self.PPlabel[idx]):
-                        if label["difficult"]:
-                            continue
-                        img_crop = get_rotate_crop_image(
-                            img, np.array(label["points"], np.float32)
-                        )
-                        img_name = (
-                            os.path.splitext(os.path.basename(idx))[0]
-                            + "_crop_"
-                            + str(i)
-                            + ".jpg"
-                        )
-                        cv2.imencode(".jpg", img_crop)[1].tofile(
-                            crop_img_dir + img_name
-                        )
-                        f.write("crop_img/" + img_name + "\t")
-                        f.write(label["transcription"] + "\n")
-                except KeyError as e:
-                    pass
-                except Exception as e:
-                    ques_img.append(key)
-                    traceback.print_exc()
-        if ques_img:
+        export = CropExport(
+            base_dir,
+            self.PPlabel,
+            [self.getImglabelidx(key) for key in self.fileStatedict],
+            workers=self.crop_export_workers,
+        )
+        progress = QProgressDialog(
+            "Exporting crops...", "Cancel", 0, len(export), self
+        )
+        progress.setWindowTitle("Export Recognition Result")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def update(done):
+            progress.setValue(done)
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        try:
+            finished = export.run(update)
+        finally:
+            progress.close()
+        print(
+            "Exported crops of %d changed images, %d images unchanged"
+            % (export.exported, len(export) - export.exported - len(export.failed))
+        )
+        if not finished:
+            QMessageBox.information(
+                self,
+                "Information",
+                "Export cancelled, rec_gt.txt and crop_img were not changed.",
+            )
+            return
+        if export.failed:
             QMessageBox.information(
                 self,
                 "Information",
                 "The following images can not be saved, please check the image path and labels.\n"
-                + "".join(str(i) + "\n" for i in ques_img),
+                + "".join(str(i) + "\n" for i in export.failed),
             )
         QMessageBox.information(
             self,
             "Information",
-            "Cropped images have been saved in " + str(crop_img_dir),
+            "Cropped images have been saved in " + str(export.cropDir),
         )
 
     def speedChoose(self):
@@ -3474,17 +3672,16 @@ class MainWindow(QMainWindow):
             self.canvas.newShape.connect(partial(self.newShape, False))
 
     def autoSaveFunc(self):
+        # every confirmation is journaled, the option only shortens the delay
+        # before the journal is folded into Label.txt
         if self.autoSaveOption.isChecked():
-            self.autoSaveNum = 1  # Real auto_Save
-            try:
-                self.saveLabelFile()
-            except Exception:
-                pass
-            print("The program will automatically save once after confirming an image")
+            # a failed compaction is reported by the journal, its records stay
+            self.compactLabels(background=True)
+            print("The program will save Label.txt shortly after confirming an image")
         else:
-            self.autoSaveNum = 5  # Used for backup
             print(
-                "The program will automatically save once after confirming 5 images (default)"
+                "The program will save Label.txt after %d seconds without confirming (default)"
+                % (COMPACT_IDLE_MS // 1000)
             )
 
     def change_box_key(self):
@@ -3576,7 +3773,7 @@ class MainWindow(QMainWindow):
             self.actions.save.setEnabled(True)
 
     def expandSelectedShape(self):
-        img = cv2.imdecode(np.fromfile(self.filePath, dtype=np.uint8), 1)
+        img = self.currentImage()
         for shape in self.canvas.selectedShapes:
             box = [[int(p.x()), int(p.y())] for p in shape.points]
             if len(box) > 4:
@@ -3623,9 +3820,10 @@ def get_main_app(argv=[]):
     Standard boilerplate Qt application code.
     Do everything but app.exec_() -- so that we can test the application in one thread
     """
-    app = QApplication(argv)
-    app.setApplicationName(__appname__)
-    app.setWindowIcon(newIcon("app"))
+    with trace.phase("QApplication"):
+        app = QApplication(argv)
+        app.setApplicationName(__appname__)
+        app.setWindowIcon(newIcon("app"))
     # Tzutalin 201705+: Accept extra arguments to change predefined class file
     arg_parser = argparse.ArgumentParser()
     arg_parser.add_argument("--lang", type=str, default="ch", nargs="?")
@@ -3656,24 +3854,67 @@ def get_main_app(argv=[]):
         nargs="?",
         help='An RGB value as "R,G,B".',
     )
+    arg_parser.add_argument(
+        "--auto_rec_workers",
+        type=int,
+        default=1,
+        nargs="?",
+        help="Number of OCR model instances used by auto recognition.",
+    )
+    arg_parser.add_argument(
+        "--auto_decode_workers",
+        type=int,
+        default=2,
+        nargs="?",
+        help="Number of threads decoding images for auto recognition.",
+    )
+    arg_parser.add_argument(
+        "--crop_export_workers",
+        type=int,
+        default=None,
+        nargs="?",
+        help="Number of processes exporting recognition crops, all CPUs by default.",
+    )
+    # read by libs.startupTrace before the arguments are parsed
+    arg_parser.add_argument(
+        "--startup_trace",
+        type=str,
+        default=None,
+        nargs="?",
+        const="startup_trace.json",
+        help="Write the time spent in each start-up phase to this JSON file.",
+    )
 
     args = arg_parser.parse_args(argv[1:])
 
-    win = MainWindow(
-        lang=args.lang,
-        gpu=args.gpu,
-        img_list_natural_sort=args.img_list_natural_sort,
-        kie_mode=args.kie,
-        default_predefined_class_file=args.predefined_classes_file,
-        det_model_dir=args.det_model_dir,
-        rec_model_dir=args.rec_model_dir,
-        rec_char_dict_path=args.rec_char_dict_path,
-        cls_model_dir=args.cls_model_dir,
-        bbox_auto_zoom_center=args.bbox_auto_zoom_center,
-        label_font_path=args.label_font_path,
-        selected_shape_color=args.selected_shape_color,
-    )
-    win.show()
+    with trace.phase("MainWindow"):
+        win = MainWindow(
+            lang=args.lang,
+            gpu=args.gpu,
+            img_list_natural_sort=args.img_list_natural_sort,
+            kie_mode=args.kie,
+            default_predefined_class_file=args.predefined_classes_file,
+            det_model_dir=args.det_model_dir,
+            rec_model_dir=args.rec_model_dir,
+            rec_char_dict_path=args.rec_char_dict_path,
+            cls_model_dir=args.cls_model_dir,
+            bbox_auto_zoom_center=args.bbox_auto_zoom_center,
+            label_font_path=args.label_font_path,
+            selected_shape_color=args.selected_shape_color,
+            auto_rec_workers=args.auto_rec_workers,
+            auto_decode_workers=args.auto_decode_workers,
+            crop_export_workers=args.crop_export_workers,
+        )
+    with trace.phase("show"):
+        win.show()
+    if trace.enabled:
+
+        def windowShown():
+            trace.mark("window shown")
+            trace.write()
+
+        # the first turn of the event loop, the window is on screen
+        QTimer.singleShot(0, windowShown)
     return app, win
 
 
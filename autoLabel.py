@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Pre-label image folders with PP-OCR without opening the GUI.
+
+Results go to Cache.cach of every folder, exactly as the Auto Recognition
+button of PPOCRLabel writes them, so annotators open folders that are already
+recognised. Interrupted runs continue where they stopped.
+
+    python autoLabel.py --workers 4 /data/batch1 /data/batch2
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+__dir__ = os.path.dirname(__file__)
+sys.path.append(os.path.join(__dir__, ""))
+
+from libs.autoRecEngine import AutoRecEngine, RunJournal, resultToLabels
+from libs.imageFolder import imageLabelIdx, iterImages, keepListing, sortImages
+from libs.labelStore import appendLabels, loadLabelFile
+from libs.lazyModel import buildPaddleOCR
+
+COMMIT_BATCH = 500
+
+
+def str2bool(v):
+    return v.lower() in ("true", "t", "1")
+
+
+def loadCheckedImages(dirpath):
+    """Image idx values confirmed in fileState.txt, auto labelling skips them."""
+    checked = set()
+    fileStatepath = os.path.join(dirpath, "fileState.txt")
+    if os.path.exists(fileStatepath):
+        with open(fileStatepath, "r", encoding="utf-8") as f:
+            for line in f:
+                if "\t" in line:
+                    checked.add(imageLabelIdx(line.split("\t")[0]))
+    return checked
+
+
+def labelFolder(dirpath, engine, kieMode=False, overwrite=False):
+    """Recognise the images of ``dirpath`` into its Cache.cach.
+
+    Ctrl+C stops the engine; the results it already has are still saved
+    and recorded, so the next run continues after them.
+    """
+    dirpath = os.path.abspath(dirpath)
+    Cachelabelpath = os.path.join(dirpath, "Cache.cach")
+    Cachelabel = loadLabelFile(Cachelabelpath)
+    journal = RunJournal(Cachelabelpath)
+    done = journal.done()
+    checked = loadCheckedImages(dirpath)
+
+    images = sortImages(list(iterImages(dirpath)))
+    todo = [
+        path
+        for path in images
+        if imageLabelIdx(path) not in checked
+        and imageLabelIdx(path) not in done
+        and (overwrite or imageLabelIdx(path) not in Cachelabel)
+    ]
+    print(
+        "%s: %d images, %d to recognise (%d checked, %d done before)"
+        % (dirpath, len(images), len(todo), len(checked), len(done))
+    )
+    if not todo:
+        journal.finish()
+        return 0
+
+    results = queue.Queue()
+    runner = threading.Thread(
+        target=engine.run,
+        args=(todo, lambda path, result: results.put((path, result))),
+        daemon=True,
+    )
+    start = time.time()
+    runner.start()
+
+    processed = 0
+    boxes = 0
+    records = []
+    while runner.is_alive() or not results.empty() or records:
+        try:
+            if not records:
+                try:
+                    records.append(results.get(timeout=1))
+                    while len(records) < COMMIT_BATCH:
+                        records.append(results.get_nowait())
+                except queue.Empty:
+                    pass
+                if not records:
+                    continue
+            # checkpoint: results first, then the images they cover; an
+            # interrupted checkpoint is written again, later lines win
+            items = []
+            for path, result in records:
+                if result:
+                    items.append((imageLabelIdx(path), resultToLabels(result, kieMode)))
+            if items:
+                with keepListing(dirpath):
+                    appendLabels(Cachelabelpath, items)
+            journal.record([imageLabelIdx(path) for path, _ in records])
+        except KeyboardInterrupt:
+            if engine.stopped():
+                # a second Ctrl+C, give up on the results still queued
+                raise
+            engine.stop()
+            print("Interrupted, saving the images recognised so far")
+            continue
+
+        for key, labels in items:
+            Cachelabel[key] = labels
+            boxes += len(labels)
+        processed += len(records)
+        records = []
+        elapsed = max(time.time() - start, 1e-6)
+        print(
+            "%d / %d images    %.2f images/s    %.1f boxes/s"
+            % (processed, len(todo), processed / elapsed, boxes / elapsed)
+        )
+    runner.join()
+
+    if engine.stopped():
+        journal.close()
+    else:
+        with keepListing(dirpath):
+            Cachelabel.save(Cachelabelpath)
+        journal.finish()
+    return processed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Auto label image folders into their Cache.cach, without the GUI."
+    )
+    arg_parser.add_argument("dirs", nargs="+", help="Dataset folders to label.")
+    arg_parser.add_argument("--lang", type=str, default="ch", nargs="?")
+    arg_parser.add_argument("--gpu", type=str2bool, default=False, nargs="?")
+    arg_parser.add_argument("--kie", type=str2bool, default=False, nargs="?")
+    arg_parser.add_argument("--det_model_dir", type=str, default=None, nargs="?")
+    arg_parser.add_argument("--rec_model_dir", type=str, default=None, nargs="?")
+    arg_parser.add_argument("--rec_char_dict_path", type=str, default=None, nargs="?")
+    arg_parser.add_argument("--cls_model_dir", type=str, default=None, nargs="?")
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of OCR model instances running in parallel.",
+    )
+    arg_parser.add_argument(
+        "--decode_workers",
+        type=int,
+        default=2,
+        help="Number of threads decoding images.",
+    )
+    arg_parser.add_argument(
+        "--overwrite",
+        type=str2bool,
+        default=False,
+        nargs="?",
+        help="Recognise images that already have results in Cache.cach again.",
+    )
+    args = arg_parser.parse_args()
+
+    params = {
+        "use_pdserving": False,
+        "use_angle_cls": True,
+        "det": True,
+        "cls": True,
+        "use_gpu": args.gpu,
+        "lang": args.lang,
+        "show_log": False,
+    }
+    if args.det_model_dir is not None:
+        params["det_model_dir"] = args.det_model_dir
+    if args.rec_model_dir is not None:
+        params["rec_model_dir"] = args.rec_model_dir
+    if args.rec_char_dict_path is not None:
+        params["rec_char_dict_path"] = args.rec_char_dict_path
+    if args.cls_model_dir is not None:
+        params["cls_model_dir"] = args.cls_model_dir
+
+    # built once, shared by the runs over all folders
+    models = {}
+
+    def modelFactory(index):
+        if index not in models:
+            models[index] = buildPaddleOCR(params)
+        return models[index]
+
+    for dirpath in args.dirs:
+        if not os.path.isdir(dirpath):
+            print("Not a folder, skipped:", dirpath)
+            continue
+        engine = AutoRecEngine(
+            modelFactory, inferWorkers=args.workers, decodeWorkers=args.decode_workers
+        )
+        try:
+            labelFolder(dirpath, engine, kieMode=args.kie, overwrite=args.overwrite)
+        except KeyboardInterrupt:
+            engine.stop()
+        if engine.stopped():
+            print("Interrupted, run again to continue")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
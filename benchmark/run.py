@@ -0,0 +1,331 @@
+"""Time the annotation hot paths of PPOCRLabel on a synthetic dataset.
+
+    python benchmark/run.py --images 500 --boxes 30 --out results.json
+
+A dataset is generated by synthData.py (the same seed gives the same data)
+in a scratch folder, then every benchmark runs ``--repeat`` times. The GUI
+benchmarks use the offscreen Qt platform and a scratch HOME, so the user's
+settings are left alone. The report is JSON: the parameters, the environment,
+the seconds of every repeat of every benchmark, and the latency histograms of
+libs.metrics collected while the GUI ran.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(__dir__, ".."))
+sys.path.append(ROOT)
+sys.path.append(__dir__)
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import synthData
+from libs.imageFolder import iterImages, sortImages
+from libs.labelStore import loadLabelFile, saveFileState
+
+
+class Context(object):
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.dataset = os.path.join(workdir, "synth")
+        self.paths = []
+        self.app = None
+        self.window = None
+
+    def labelPath(self):
+        return os.path.join(self.dataset, "Label.txt")
+
+
+def benchLabelLoad(ctx):
+    """Open Label.txt without its index sidecar, as on the first import."""
+    indexPath = ctx.labelPath() + ".idx"
+    if os.path.exists(indexPath):
+        os.remove(indexPath)
+    start = time.perf_counter()
+    labels = loadLabelFile(ctx.labelPath())
+    return time.perf_counter() - start, len(labels)
+
+
+def benchLabelParse(ctx):
+    """Decode every entry of Label.txt."""
+    labels = loadLabelFile(ctx.labelPath())
+    start = time.perf_counter()
+    boxes = sum(len(value) for value in labels.values())
+    return time.perf_counter() - start, boxes
+
+
+def benchLabelSave(ctx):
+    """Confirm one image and write Label.txt and fileState.txt back."""
+    labels = loadLabelFile(ctx.labelPath())
+    copyPath = os.path.join(ctx.workdir, "Label.txt")
+    key = next(iter(labels))
+    start = time.perf_counter()
+    labels[key] = list(labels[key])
+    labels.save(copyPath)
+    saveFileState(
+        os.path.join(ctx.workdir, "fileState.txt"), {key: 1 for key in labels}
+    )
+    return time.perf_counter() - start, len(labels)
+
+
+def benchDirScan(ctx):
+    """List and sort the images of the folder, without Qt."""
+    start = time.perf_counter()
+    images = sortImages(list(iterImages(ctx.dataset)))
+    return time.perf_counter() - start, len(images)
+
+
+def mainWindow(ctx):
+    if ctx.window is None:
+        # settings go to a scratch home, never to the user's
+        os.environ["HOME"] = ctx.workdir
+        from PyQt5.QtWidgets import QApplication
+        from PPOCRLabel import MainWindow
+
+        ctx.app = QApplication.instance() or QApplication([])
+        ctx.window = MainWindow(
+            lang="en",
+            gpu=False,
+            default_predefined_class_file=os.path.join(
+                ROOT, "data", "predefined_classes.txt"
+            ),
+            preload_models=False,
+        )
+        ctx.window.resize(1600, 1000)
+        ctx.window.show()
+        ctx.app.processEvents()
+    return ctx.window
+
+
+def waitFor(ctx, condition, timeout=600):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise RuntimeError("Timed out")
+        ctx.app.processEvents()
+        time.sleep(0.001)
+
+
+def benchDirImport(ctx):
+    """Open the folder in the GUI until the first image is shown."""
+    win = mainWindow(ctx)
+    win.filePath = None
+    # the folder listing cache would make every repeat but the first a hit
+    listing = os.path.join(ctx.dataset, ".imageList.json")
+    if os.path.exists(listing):
+        os.remove(listing)
+    start = time.perf_counter()
+    win.importDirImages(ctx.dataset)
+    waitFor(ctx, lambda: win.filePath is not None)
+    ctx.app.processEvents()
+    return time.perf_counter() - start, len(win.mImgList)
+
+
+def benchNavigate(ctx):
+    """Step through images with "next", painting each one."""
+    win = mainWindow(ctx)
+    if not win.mImgList:
+        benchDirImport(ctx)
+    steps = min(ctx.args.navigate, len(win.mImgList) - 1)
+    win.loadFile(win.mImgList[0])
+    ctx.app.processEvents()
+    start = time.perf_counter()
+    for _ in range(steps):
+        win.openNextImg()
+        win.canvas.repaint()
+        ctx.app.processEvents()
+    return time.perf_counter() - start, steps
+
+
+def benchCropExport(ctx):
+    """Export the crops of every labelled image, as saveRecResult does."""
+    from libs.cropExport import CropExport
+
+    labels = loadLabelFile(ctx.labelPath())
+    export = CropExport(ctx.dataset, labels, list(labels), workers=ctx.args.workers)
+    shutil.rmtree(export.cropDir, ignore_errors=True)
+    start = time.perf_counter()
+    export.run(full=True)
+    return time.perf_counter() - start, export.crops
+
+
+def benchCropReexport(ctx):
+    """Export again after one image in a hundred was relabelled."""
+    from libs.cropExport import CropExport
+
+    labels = loadLabelFile(ctx.labelPath())
+    CropExport(ctx.dataset, labels, list(labels), workers=ctx.args.workers).run()
+    labels = {key: list(value) for key, value in labels.items()}
+    for key in list(labels)[::100]:
+        boxes = [dict(label) for label in labels[key]]
+        # drop a box and retype another, one box images are only retyped
+        if len(boxes) > 1:
+            boxes.pop()
+        if boxes:
+            boxes[0]["transcription"] += "_"
+        labels[key] = boxes
+    export = CropExport(ctx.dataset, labels, list(labels), workers=ctx.args.workers)
+    start = time.perf_counter()
+    export.run()
+    elapsed = time.perf_counter() - start
+    # leave the crops matching Label.txt for the split benchmark
+    CropExport(ctx.dataset, loadLabelFile(ctx.labelPath()), list(labels)).run()
+    return elapsed, export.exported
+
+
+def benchSplit(ctx):
+    """Run gen_ocr_train_val_test.py over the labelled dataset."""
+    if not os.path.exists(os.path.join(ctx.dataset, "rec_gt.txt")):
+        benchCropExport(ctx)
+    command = [
+        sys.executable,
+        os.path.join(ROOT, "gen_ocr_train_val_test.py"),
+        "--datasetRootPath",
+        ctx.dataset,
+        "--detRootPath",
+        os.path.join(ctx.workdir, "det"),
+        "--recRootPath",
+        os.path.join(ctx.workdir, "rec"),
+    ]
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(ctx.dataset, "rec_gt.txt"), encoding="utf-8") as f:
+        crops = sum(1 for _ in f)
+    return elapsed, crops
+
+
+BENCHMARKS = [
+    ("labelLoad", benchLabelLoad),
+    ("labelParse", benchLabelParse),
+    ("labelSave", benchLabelSave),
+    ("dirScan", benchDirScan),
+    ("dirImport", benchDirImport),
+    ("navigate", benchNavigate),
+    ("cropExport", benchCropExport),
+    ("cropReexport", benchCropReexport),
+    ("split", benchSplit),
+]
+
+
+def gitRevision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples):
+    seconds = [s for s, _ in samples]
+    items = samples[-1][1]
+    median = statistics.median(seconds)
+    return {
+        "seconds": seconds,
+        "median": median,
+        "min": min(seconds),
+        "items": items,
+        "msPerItem": median * 1000.0 / items if items else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--boxes", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=960)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--navigate", type=int, default=50, help="Images stepped through by navigate."
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=[name for name, _ in BENCHMARKS],
+        help="Run only these benchmarks.",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Crop export processes, all CPUs by default."
+    )
+    parser.add_argument("--workdir", help="Scratch folder, kept when given.")
+    parser.add_argument("--out", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ppocrlabel_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    ctx = Context(args, workdir)
+    try:
+        print("Generating %d images in %s" % (args.images, ctx.dataset))
+        start = time.perf_counter()
+        ctx.paths = synthData.generate(
+            ctx.dataset,
+            images=args.images,
+            boxes=args.boxes,
+            width=args.width,
+            height=args.height,
+            seed=args.seed,
+        )
+        print("Generated in %.1fs" % (time.perf_counter() - start))
+
+        results = {}
+        for name, bench in BENCHMARKS:
+            if args.only and name not in args.only:
+                continue
+            samples = [bench(ctx) for _ in range(args.repeat)]
+            results[name] = summarize(samples)
+            print(
+                "%-12s median %8.3fs  min %8.3fs  %6d items"
+                % (name, results[name]["median"], results[name]["min"], samples[-1][1])
+            )
+
+        from libs.metrics import metrics
+
+        report = {
+            "params": {
+                key: getattr(args, key)
+                for key in (
+                    "images",
+                    "boxes",
+                    "width",
+                    "height",
+                    "seed",
+                    "repeat",
+                    "workers",
+                )
+            },
+            "environment": {
+                "revision": gitRevision(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "results": results,
+            "hotPaths": metrics.snapshot(),
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("Results written to", os.path.abspath(args.out))
+    finally:
+        # the window is not closed, closing it asks whether to save
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
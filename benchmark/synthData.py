@@ -0,0 +1,116 @@
+"""Generate a synthetic PPOCRLabel dataset folder.
+
+The folder holds ``images`` JPEG pages with ``boxes`` text boxes each, and the
+Label.txt, Cache.cach and fileState.txt PPOCRLabel would have written for
+them. The same seed always gives the same folder.
+
+    python benchmark/synthData.py --images 1000 --boxes 30 /tmp/synth
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+
+import cv2
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(__dir__, ".."))
+
+from libs.labelStore import saveFileState
+
+CHARS = string.ascii_letters + string.digits
+
+
+def randomQuad(rng, width, height):
+    """A slightly rotated text box inside the page, as four integer points."""
+    w = rng.randint(width // 12, width // 3)
+    h = rng.randint(16, 48)
+    cx = rng.randint(w // 2 + 4, width - w // 2 - 4)
+    cy = rng.randint(h // 2 + 4, height - h // 2 - 4)
+    angle = rng.uniform(-8, 8)
+    rect = ((cx, cy), (w, h), angle)
+    points = cv2.boxPoints(rect)
+    points[:, 0] = np.clip(points[:, 0], 0, width - 1)
+    points[:, 1] = np.clip(points[:, 1], 0, height - 1)
+    # PPOCRLabel order: top-left, top-right, bottom-right, bottom-left
+    points = points[np.argsort(points[:, 1])]
+    top = sorted(points[:2].tolist())
+    bottom = sorted(points[2:].tolist(), reverse=True)
+    return [[int(x), int(y)] for x, y in top + bottom]
+
+
+def randomPage(rng, width, height, boxes):
+    image = np.full((height, width, 3), 255, np.uint8)
+    noise = np.random.RandomState(rng.randint(0, 1 << 30))
+    image -= noise.randint(0, 24, (height, width, 1), dtype=np.uint8)
+    labels = []
+    for _ in range(boxes):
+        points = randomQuad(rng, width, height)
+        text = "".join(rng.choice(CHARS) for _ in range(rng.randint(3, 16)))
+        x, y = points[3]
+        cv2.putText(
+            image, text, (x, y - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (20, 20, 20), 2
+        )
+        labels.append({"transcription": text, "points": points, "difficult": False})
+    return image, labels
+
+
+def generate(folder, images=200, boxes=20, width=1280, height=960, checked=0.5, seed=0):
+    """Write the dataset to ``folder`` and return the list of image paths."""
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    folder = os.path.abspath(folder)
+    dirName = os.path.basename(folder)
+
+    paths = []
+    labels = []
+    for i in range(images):
+        name = "img_%06d.jpg" % i
+        path = os.path.join(folder, name)
+        image, pageLabels = randomPage(rng, width, height, boxes)
+        cv2.imencode(".jpg", image)[1].tofile(path)
+        paths.append(path)
+        labels.append((dirName + "/" + name, pageLabels))
+
+    checkedCount = int(len(labels) * checked)
+    with open(os.path.join(folder, "Label.txt"), "w", encoding="utf-8") as f:
+        for idx, pageLabels in labels[:checkedCount]:
+            f.write(idx + "\t" + json.dumps(pageLabels, ensure_ascii=False) + "\n")
+    with open(os.path.join(folder, "Cache.cach"), "w", encoding="utf-8") as f:
+        for idx, pageLabels in labels:
+            f.write(idx + "\t" + json.dumps(pageLabels, ensure_ascii=False) + "\n")
+    saveFileState(
+        os.path.join(folder, "fileState.txt"),
+        {path: 1 for path in paths[:checkedCount]},
+    )
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("folder")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--boxes", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=960)
+    parser.add_argument(
+        "--checked", type=float, default=0.5, help="Fraction of confirmed images."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(
+        args.folder,
+        images=args.images,
+        boxes=args.boxes,
+        width=args.width,
+        height=args.height,
+        checked=args.checked,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,78 +8,64 @@ except ImportError:
 
 import time
 import datetime
-import json
-import cv2
-import numpy as np
+import os
+import queue
+import threading
+from collections import deque
 
+from libs.autoRecEngine import AutoRecEngine
 from libs.utils import newIcon
 
 BB = QDialogButtonBox
 
 
 class Worker(QThread):
-    progressBarValue = pyqtSignal(int)
-    listValue = pyqtSignal(str)
     endsignal = pyqtSignal(int, str)
     handle = 0
 
-    def __init__(self, ocr, mImgList, mainThread, model):
+    def __init__(self, engine, mImgList, mainThread, model):
         super(Worker, self).__init__()
-        self.ocr = ocr
+        self.engine = engine
         self.mImgList = mImgList
         self.mainThread = mainThread
         self.model = model
+        # progress counters, read by the GUI thread on a timer
+        self.findex = 0
+        self.boxes = 0
+        # (path, boxes) records, drained in batches by the GUI thread
+        self.results = queue.Queue()
+        # last lines of the log, older ones are dropped if the GUI lags behind
+        self.log = deque(maxlen=AutoDialog.LOG_LINES)
+        self._lock = threading.Lock()
         self.setStackSize(1024 * 1024)
 
+    def stop(self):
+        self.handle = -1
+        self.engine.stop()
+
+    def onResult(self, Imgpath, result_dic):
+        # called from the inference threads of the engine
+        # every processed image is committed, so that a resumed run skips it
+        self.results.put((Imgpath, result_dic))
+        name = os.path.basename(Imgpath)
+        if result_dic is None or len(result_dic) == 0:
+            print("Can not recognise file", Imgpath)
+            self.log.append(name + ": can not recognise")
+        else:
+            self.log.append("%s: %d boxes" % (name, len(result_dic)))
+        with self._lock:
+            self.findex += 1
+            self.boxes += len(result_dic or [])
+
+    def progress(self):
+        """Number of processed images and of recognised boxes so far."""
+        with self._lock:
+            return self.findex, self.boxes
+
     def run(self):
         try:
-            findex = 0
-            for Imgpath in self.mImgList:
-                if self.handle == 0:
-                    self.listValue.emit(Imgpath)
-                    if self.model == "paddle":
-                        h, w, _ = cv2.imdecode(
-                            np.fromfile(Imgpath, dtype=np.uint8), 1
-                        ).shape
-                        if h > 32 and w > 32:
-                            self.result_dic = self.ocr.ocr(Imgpath, cls=True, det=True)[
-                                0
-                            ]
-                        else:
-                            print(
-                                "The size of", Imgpath, "is too small to be recognised"
-                            )
-                            self.result_dic = None
-
-                    # 结果保存
-                    if self.result_dic is None or len(self.result_dic) == 0:
-                        print("Can not recognise file", Imgpath)
-                        pass
-                    else:
-                        strs = ""
-                        for res in self.result_dic:
-                            chars = res[1][0]
-                            cond = res[1][1]
-                            posi = res[0]
-                            strs += (
-                                "Transcription: "
-                                + chars
-                                + " Probability: "
-                                + str(cond)
-                                + " Location: "
-                                + json.dumps(posi)
-                                + "\n"
-                            )
-                        # Sending large amounts of data repeatedly through pyqtSignal may affect the program efficiency
-                        self.listValue.emit(strs)
-                        self.mainThread.result_dic = self.result_dic
-                        self.mainThread.filePath = Imgpath
-                        # 保存
-                        self.mainThread.saveFile(mode="Auto")
-                    findex += 1
-                    self.progressBarValue.emit(findex)
-                else:
-                    break
+            if self.handle == 0:
+                self.engine.run(self.mImgList, self.onResult)
             self.endsignal.emit(0, "readAll")
             self.exec()
         except Exception as e:
@@ -88,8 +74,20 @@ class Worker(QThread):
 
 
 class AutoDialog(QDialog):
+    COMMIT_INTERVAL_MS = 200
+    COMMIT_BATCH = 500
+    LOG_LINES = 1000
+
     def __init__(
-        self, text="Enter object label", parent=None, ocr=None, mImgList=None, lenbar=0
+        self,
+        text="Enter object label",
+        parent=None,
+        ocr=None,
+        mImgList=None,
+        lenbar=0,
+        modelFactory=None,
+        inferWorkers=1,
+        decodeWorkers=2,
     ):
         super(AutoDialog, self).__init__(parent)
         self.setFixedWidth(1000)
@@ -103,9 +101,14 @@ class AutoDialog(QDialog):
 
         layout = QVBoxLayout()
         layout.addWidget(self.pb)
+        self.statsLabel = QLabel(self)
+        layout.addWidget(self.statsLabel)
         self.model = "paddle"
-        self.listWidget = QListWidget(self)
-        layout.addWidget(self.listWidget)
+        self.logView = QPlainTextEdit(self)
+        self.logView.setReadOnly(True)
+        # the view drops its oldest lines, memory stays flat on long runs
+        self.logView.setMaximumBlockCount(self.LOG_LINES)
+        layout.addWidget(self.logView)
 
         self.buttonBox = bb = BB(BB.Ok | BB.Cancel, Qt.Horizontal, self)
         bb.button(BB.Ok).setIcon(newIcon("done"))
@@ -121,47 +124,88 @@ class AutoDialog(QDialog):
 
         # self.setWindowFlags(Qt.WindowCloseButtonHint)
 
-        self.thread_1 = Worker(self.ocr, self.mImgList, self.parent, "paddle")
-        self.thread_1.progressBarValue.connect(self.handleProgressBarSingal)
-        self.thread_1.listValue.connect(self.handleListWidgetSingal)
+        if modelFactory is None:
+            modelFactory = lambda index: self.ocr
+            inferWorkers = 1
+        self.engine = AutoRecEngine(
+            modelFactory, inferWorkers=inferWorkers, decodeWorkers=decodeWorkers
+        )
+        self.thread_1 = Worker(self.engine, self.mImgList, self.parent, "paddle")
+        # all images were processed, as opposed to a cancelled run
+        self.completed = False
+        self.commitTimer = QTimer(self)
+        self.commitTimer.setInterval(self.COMMIT_INTERVAL_MS)
+        self.commitTimer.timeout.connect(self.commitResults)
+        self.commitTimer.timeout.connect(self.updateProgress)
         self.thread_1.endsignal.connect(self.handleEndsignalSignal)
         self.time_start = time.time()  # save start time
 
-    def handleProgressBarSingal(self, i):
-        self.pb.setValue(i)
-
-        # calculate time left of auto labeling
-        avg_time = (
-            time.time() - self.time_start
-        ) / i  # Use average time to prevent time fluctuations
-        time_left = str(datetime.timedelta(seconds=avg_time * (self.lender - i))).split(
-            "."
-        )[
-            0
-        ]  # Remove microseconds
+    def updateProgress(self):
+        """Show the progress made since the last tick of the timer."""
+        done, boxes = self.thread_1.progress()
+        self.pb.setValue(done)
+
+        lines = []
+        while True:
+            try:
+                lines.append(self.thread_1.log.popleft())
+            except IndexError:
+                break
+        if lines:
+            self.logView.appendPlainText("\n".join(lines))
+
+        elapsed = max(time.time() - self.time_start, 1e-6)
+        imagesPerSec = done / elapsed
+        if imagesPerSec > 0:
+            time_left = str(
+                datetime.timedelta(seconds=(self.lender - done) / imagesPerSec)
+            ).split(".")[0]  # Remove microseconds
+        else:
+            time_left = "--:--:--"
+        self.statsLabel.setText(
+            "%d / %d images    %.2f images/s    %.1f boxes/s    ETA %s"
+            % (done, self.lender, imagesPerSec, boxes / elapsed, time_left)
+        )
         self.setWindowTitle("PPOCRLabel  --  " + f"Time Left: {time_left}")  # show
 
-    def handleListWidgetSingal(self, i):
-        self.listWidget.addItem(i)
-        titem = self.listWidget.item(self.listWidget.count() - 1)
-        self.listWidget.scrollToItem(titem)
+    def commitResults(self):
+        """Move the finished results into the label dicts of the main window."""
+        records = []
+        while len(records) < self.COMMIT_BATCH:
+            try:
+                records.append(self.thread_1.results.get_nowait())
+            except queue.Empty:
+                break
+        if records:
+            self.parent.commitAutoResults(records)
+        return len(records)
+
+    def commitAllResults(self):
+        while self.commitResults():
+            pass
 
     def handleEndsignalSignal(self, i, str):
         if i == 0 and str == "readAll":
+            self.commitTimer.stop()
+            self.commitAllResults()
+            self.updateProgress()
+            self.completed = not self.thread_1.engine.stopped()
             self.buttonBox.button(BB.Ok).setEnabled(True)
             self.buttonBox.button(BB.Cancel).setEnabled(False)
 
     def reject(self):
         print("reject")
-        self.thread_1.handle = -1
+        self.thread_1.stop()
         self.thread_1.quit()
         # del self.thread_1
         # if self.thread_1.isRunning():
         #     self.thread_1.terminate()
         # self.thread_1.quit()
         # super(AutoDialog,self).reject()
-        while not self.thread_1.isFinished():
-            pass
+        # waits for the images that are being recognised right now
+        self.thread_1.wait()
+        self.commitTimer.stop()
+        self.commitAllResults()
         self.accept()
 
     def validate(self):
@@ -178,6 +222,7 @@ class AutoDialog(QDialog):
 
     def popUp(self):
         self.thread_1.start()
+        self.commitTimer.start()
         return 1 if self.exec_() else None
 
     def closeEvent(self, event):
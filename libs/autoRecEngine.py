@@ -0,0 +1,187 @@
+"""Pipelined auto recognition, independent of Qt.
+
+Images are decoded by a pool of decoder threads into a bounded queue, which
+feeds one or more inference threads. Every inference thread owns its own
+model, a PaddleOCR predictor must not be shared between threads. Paddle runs
+inference outside the GIL, so the threads really work in parallel.
+"""
+import os
+import queue
+import threading
+import traceback
+
+from libs.imageCache import decodeImage
+from libs.imageFolder import keepListing
+from libs.metrics import metrics
+
+_DONE = object()
+
+
+def resultToLabels(result, kieMode=False):
+    """Convert the OCR boxes of one image to the entries stored in Label.txt."""
+    labels = []
+    for box in result or []:
+        if box[1][0] == "":
+            continue
+        label = {"transcription": box[1][0], "points": box[0], "difficult": False}
+        if kieMode:
+            label["key_cls"] = box[2] if len(box) == 3 else "None"
+        labels.append(label)
+    return labels
+
+
+class AutoRecEngine(object):
+    """Run ``model.ocr(image, cls=True, det=True)`` over many images, once.
+
+    ``modelFactory(index)`` returns the model of inference thread ``index``.
+    Models with a true ``takesPath`` attribute (the cloud OCR) get the image
+    path instead of decoded pixels, and no decoding is done for them.
+    """
+
+    def __init__(self, modelFactory, inferWorkers=1, decodeWorkers=2, minSize=32):
+        self.modelFactory = modelFactory
+        self.inferWorkers = max(1, inferWorkers)
+        self.decodeWorkers = max(1, decodeWorkers)
+        self.minSize = minSize
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def run(self, paths, onResult):
+        """Recognize ``paths`` and block until all are done or ``stop()`` is called.
+
+        ``onResult(path, result)`` is called from the inference threads with
+        the OCR boxes of one image, or None if it could not be recognised.
+        """
+        models = [self.modelFactory(i) for i in range(self.inferWorkers)]
+        takesPath = getattr(models[0], "takesPath", False)
+
+        todo = queue.Queue()
+        for path in paths:
+            todo.put(path)
+        # bounded, decoded pages are large
+        decoded = queue.Queue(maxsize=2 * self.inferWorkers + 2)
+
+        decoders = [
+            threading.Thread(
+                target=self._decodeLoop,
+                args=(todo, decoded, takesPath),
+                name="autoRecDecode%d" % i,
+                daemon=True,
+            )
+            for i in range(self.decodeWorkers)
+        ]
+        inferers = [
+            threading.Thread(
+                target=self._inferLoop,
+                args=(model, decoded, takesPath, onResult),
+                name="autoRecInfer%d" % i,
+                daemon=True,
+            )
+            for i, model in enumerate(models)
+        ]
+        for thread in decoders + inferers:
+            thread.start()
+        for thread in decoders:
+            thread.join()
+        for _ in inferers:
+            decoded.put(_DONE)
+        for thread in inferers:
+            thread.join()
+
+    def _decodeLoop(self, todo, decoded, takesPath):
+        while not self._stopped.is_set():
+            try:
+                path = todo.get_nowait()
+            except queue.Empty:
+                return
+            image = None
+            if not takesPath:
+                try:
+                    image = decodeImage(path)
+                except Exception:
+                    traceback.print_exc()
+            while not self._stopped.is_set():
+                try:
+                    decoded.put((path, image), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def _inferLoop(self, model, decoded, takesPath, onResult):
+        while True:
+            item = decoded.get()
+            if item is _DONE:
+                return
+            if self._stopped.is_set():
+                # drain so that the decoders and run() are not blocked
+                continue
+            path, image = item
+            result = self.recognize(model, path, image, takesPath)
+            onResult(path, result)
+
+    @metrics.timed("ocr.auto")
+    def recognize(self, model, path, image, takesPath=False):
+        try:
+            if takesPath:
+                return model.ocr(path, cls=True, det=True)[0]
+            if image is None:
+                print("Can not read", path)
+                return None
+            h, w = image.shape[:2]
+            if h > self.minSize and w > self.minSize:
+                return model.ocr(image, cls=True, det=True)[0]
+            print("The size of", path, "is too small to be recognised")
+            return None
+        except Exception:
+            traceback.print_exc()
+            return None
+
+
+class RunJournal(object):
+    """Image idx values already processed by an auto recognition run.
+
+    Lets a cancelled or crashed run continue where it stopped. Results must
+    be written to Cache.cach before their images are recorded here.
+    """
+
+    SUFFIX = ".run"
+
+    def __init__(self, cachePath):
+        self.path = cachePath + self.SUFFIX
+        self.folder = os.path.dirname(os.path.abspath(cachePath))
+        self._file = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def done(self):
+        if not self.exists():
+            return set()
+        with open(self.path, "r", encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.endswith("\n")}
+
+    def record(self, keys):
+        if self._file is None:
+            with keepListing(self.folder):
+                self._file = open(self.path, "a", encoding="utf-8")
+        for key in keys:
+            self._file.write(key + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        """The run completed, forget it."""
+        self.close()
+        if self.exists():
+            with keepListing(self.folder):
+                os.remove(self.path)
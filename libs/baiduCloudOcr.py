@@ -36,6 +36,9 @@ class _OcrResultManager:
             return json.loads(f.read())
  
 class BaiduCloudOCR:
+    # ocr() reads the image file itself, auto recognition passes paths
+    takesPath = True
+
     def __init__(self):
         try:
             with open('.baidu_key.yaml', 'r') as file:
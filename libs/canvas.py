@@ -13,10 +13,13 @@
 
 import copy
 
-from PyQt5.QtCore import Qt, pyqtSignal, QPointF, QPoint
+from PyQt5.QtCore import Qt, pyqtSignal, QPointF, QPoint, QRectF
 from PyQt5.QtGui import QPainter, QBrush, QColor, QPixmap
 from PyQt5.QtWidgets import QWidget, QMenu, QApplication
+from libs.imagePyramid import ImagePyramid
+from libs.metrics import metrics
 from libs.shape import Shape
+from libs.spatialIndex import ShapeIndex, VersionedList
 from libs.utils import distance
 
 CURSOR_DEFAULT = Qt.ArrowCursor
@@ -46,6 +49,8 @@ class Canvas(QWidget):
         super(Canvas, self).__init__(*args, **kwargs)
         # Initialise local state.
         self.mode = self.EDIT
+        # hit-testing only looks at the shapes near the cursor
+        self.shapeIndex = ShapeIndex(margin=self.epsilon)
         self.shapes = []
         self.shapesBackups = []
         self.current = None
@@ -59,6 +64,7 @@ class Canvas(QWidget):
         self.offsets = QPointF(), QPointF()
         self.scale = 1.0
         self.pixmap = QPixmap()
+        self.labelFontSize = 8  # set for every image by loadPixmap
         self.visible = {}
         self._hideBackround = False
         self.hideBackround = False
@@ -85,6 +91,20 @@ class Canvas(QWidget):
         self.lockedShapes = []
         self.isInTheSameImage = False
 
+    @property
+    def shapes(self):
+        return self._shapes
+
+    @shapes.setter
+    def shapes(self, shapes):
+        self._shapes = VersionedList(shapes)
+
+    def shapesAt(self, pos):
+        """Visible shapes whose bounding box, grown by epsilon, holds ``pos``,
+        topmost first."""
+        self.shapeIndex.sync(self.shapes)
+        return [s for s in self.shapeIndex.query(pos) if self.isVisible(s)]
+
     def setDrawingColor(self, qColor):
         self.drawingLineColor = qColor
         self.drawingRectColor = qColor
@@ -220,9 +240,10 @@ class Canvas(QWidget):
         # - Highlight shapes
         # - Highlight vertex
         # Update shape/vertex fill and tooltip value accordingly.
-        for shape in reversed([s for s in self.shapes if self.isVisible(s)]):
-            # Look for a nearby vertex to highlight. If that fails,
-            # check if we happen to be inside a shape.
+        # Look for a nearby vertex to highlight. If that fails,
+        # check if we happen to be inside a shape.
+        nearby = self.shapesAt(pos)
+        for shape in nearby:
             index = shape.nearestVertex(pos, self.epsilon)
             if index is not None:
                 if self.selectedVertex():
@@ -232,21 +253,21 @@ class Canvas(QWidget):
                 self.overrideCursor(CURSOR_POINT)
                 self.update()
                 break
-            else:
-                for shape in reversed([s for s in self.shapes if self.isVisible(s)]):
-                    if shape.containsPoint(pos):
-                        if self.selectedVertex():
-                            self.hShape.highlightClear()
-                        self.hVertex, self.hShape = None, shape
-                        self.overrideCursor(CURSOR_GRAB)
-                        self.update()
-                        break
-                else:  # Nothing found, clear highlights, reset state.
-                    if self.hShape:
+        else:
+            for shape in nearby:
+                if shape.containsPoint(pos):
+                    if self.selectedVertex():
                         self.hShape.highlightClear()
-                        self.update()
-                    self.hVertex, self.hShape = None, None
-                    self.overrideCursor(CURSOR_DEFAULT)
+                    self.hVertex, self.hShape = None, shape
+                    self.overrideCursor(CURSOR_GRAB)
+                    self.update()
+                    break
+            else:  # Nothing found, clear highlights, reset state.
+                if self.hShape:
+                    self.hShape.highlightClear()
+                    self.update()
+                self.hVertex, self.hShape = None, None
+                self.overrideCursor(CURSOR_DEFAULT)
 
     def mousePressEvent(self, ev):
         pos = self.transformPos(ev.pos())
@@ -405,8 +426,8 @@ class Canvas(QWidget):
             shape.highlightVertex(index, shape.MOVE_VERTEX)
             return self.hVertex
         else:
-            for shape in reversed(self.shapes):
-                if self.isVisible(shape) and shape.containsPoint(point):
+            for shape in self.shapesAt(point):
+                if shape.containsPoint(point):
                     self.calculateOffsets(shape, point)
                     self.setHiding()
                     if multiple_selection_mode:
@@ -563,6 +584,7 @@ class Canvas(QWidget):
             if not self.boundedMoveShape(shape, point - offset):
                 self.boundedMoveShape(shape, point + offset)
 
+    @metrics.timed("Canvas.paintEvent")
     def paintEvent(self, event):
         if not self.pixmap:
             return super(Canvas, self).paintEvent(event)
@@ -576,10 +598,26 @@ class Canvas(QWidget):
         p.scale(self.scale, self.scale)
         p.translate(self.offsetToCenter())
 
-        p.drawPixmap(0, 0, self.pixmap)
+        # the part of the image that needs repainting, shapes outside are skipped
+        offset = self.offsetToCenter()
+        exposed = QRectF(event.rect())
+        exposed = QRectF(
+            exposed.x() / self.scale - offset.x(),
+            exposed.y() / self.scale - offset.y(),
+            exposed.width() / self.scale,
+            exposed.height() / self.scale,
+        )
+
+        if isinstance(self.pixmap, ImagePyramid):
+            self.pixmap.draw(p, exposed, self.scale)
+        else:
+            p.drawPixmap(0, 0, self.pixmap)
         Shape.scale = self.scale
         for shape in self.shapes:
             if (shape.selected or not self._hideBackround) and self.isVisible(shape):
+                shape.fontsize = self.labelFontSize
+                if not shape.points or not shape.paintRect().intersects(exposed):
+                    continue
                 shape.fill = shape.selected or shape == self.hShape
                 shape.paint(p)
         if self.current:
@@ -645,13 +683,6 @@ class Canvas(QWidget):
             pal.setColor(self.backgroundRole(), QColor(232, 232, 232, 255))
             self.setPalette(pal)
 
-        # adaptive BBOX label & index font size
-        if self.pixmap:
-            h, w = self.pixmap.size().height(), self.pixmap.size().width()
-            fontszie = int(max(h, w) / 48)
-            for s in self.shapes:
-                s.fontsize = fontszie
-
         p.end()
 
     def fillDrawing(self):
@@ -893,6 +924,8 @@ class Canvas(QWidget):
 
     def loadPixmap(self, pixmap):
         self.pixmap = pixmap
+        # adaptive BBOX label & index font size
+        self.labelFontSize = int(max(pixmap.width(), pixmap.height()) / 48)
         self.shapes = []
         self.repaint()
 
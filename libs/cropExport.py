@@ -0,0 +1,283 @@
+"""Export of the recognition crops of the checked images (rec_gt.txt, crop_img/).
+
+Images are decoded, cropped and encoded by a pool of processes. Results are
+collected in submission order, so rec_gt.txt lists the crops in the order of
+the images given, whatever order the workers finish in.
+
+Crops are written to a staging folder and rec_gt.txt to a temporary file.
+Both are moved into place only when the export completes, so a cancelled
+export leaves crop_img/ and rec_gt.txt as they were.
+
+A manifest in crop_img/ records, per image, a hash of its labels and file
+stamp and the crops written for it. The workers hash the images too. Images
+whose hash did not change since the last export keep their crops, only their
+rec_gt.txt lines are written again. Crops of boxes or images that are gone
+are deleted.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+from libs.geometry import cropPolygons
+from libs.imageFolder import keepListing
+
+CROP_DIR = "crop_img"
+REC_GT = "rec_gt.txt"
+MANIFEST_NAME = ".manifest.json"
+STAGING_NAME = ".staging"
+
+_MANIFEST_VERSION = 1
+
+
+def cropName(idx, i):
+    return os.path.splitext(os.path.basename(idx))[0] + "_crop_" + str(i) + ".jpg"
+
+
+def cropLabels(idx, labels):
+    """``(crop name, label)`` of the boxes of an image that are exported."""
+    return [
+        (cropName(idx, i), label)
+        for i, label in enumerate(labels)
+        if not label["difficult"]
+    ]
+
+
+def recLines(idx, labels, names):
+    """rec_gt.txt lines of the crops ``names`` that were written for an image."""
+    return [
+        CROP_DIR + "/" + name + "\t" + label["transcription"] + "\n"
+        for name, label in cropLabels(idx, labels)
+        if name in names
+    ]
+
+
+def labelHash(imgPath, labels):
+    """Changes with the boxes and transcriptions and with the image file."""
+    st = os.stat(imgPath)
+    data = json.dumps(
+        [labels, st.st_mtime_ns, st.st_size], ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def exportImage(imgPath, idx, labels, cropDir):
+    """Write the crops of one image, return the names written and the names
+    of boxes that could not be cropped."""
+    img = cv2.imdecode(np.fromfile(imgPath, dtype=np.uint8), -1)
+    if img is None:
+        raise ValueError("Can not decode " + imgPath)
+    boxes = cropLabels(idx, labels)
+    crops = cropPolygons(img, [label["points"] for _, label in boxes])
+    written, bad = [], []
+    for (name, _), crop in zip(boxes, crops):
+        if crop is None:
+            bad.append(name)
+            continue
+        cv2.imencode(".jpg", crop)[1].tofile(os.path.join(cropDir, name))
+        written.append(name)
+    return written, bad
+
+
+def _exportJob(job):
+    """Worker side of an image: ``((digest, written, bad, changed), error)``.
+
+    An image whose hash matches ``oldEntry`` and whose crops are all still
+    there is left alone, otherwise its crops are written to ``stagingDir``.
+    """
+    imgPath, idx, labels, cropDir, stagingDir, oldEntry = job
+    try:
+        try:
+            digest = labelHash(imgPath, labels)
+        except OSError:
+            digest = None
+        if (
+            digest is not None
+            and oldEntry is not None
+            and oldEntry[0] == digest
+            and all(os.path.exists(os.path.join(cropDir, n)) for n in oldEntry[1])
+        ):
+            return (digest, oldEntry[1], [], False), None
+        written, bad = exportImage(imgPath, idx, labels, stagingDir)
+        return (digest, written, bad, True), None
+    except Exception as e:
+        return None, "%s: %s" % (type(e).__name__, e)
+
+
+def loadManifest(cropDir):
+    """``{idx: [hash, crop names]}`` of the last export, empty if unusable."""
+    try:
+        with open(os.path.join(cropDir, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != _MANIFEST_VERSION:
+            return {}
+        return manifest["images"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        return {}
+
+
+def saveManifest(cropDir, images):
+    path = os.path.join(cropDir, MANIFEST_NAME)
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "w", encoding="utf-8") as f:
+        json.dump({"version": _MANIFEST_VERSION, "images": images}, f)
+    os.replace(tmpPath, path)
+
+
+def _runNow(fn, *args):
+    """``Executor.submit`` without an executor, for exports in this process."""
+    future = Future()
+    future.set_result(fn(*args))
+    return future
+
+
+class CropExport(object):
+    """Crops of ``labels`` (``{idx: [label, ...]}``) for the images ``keys``.
+
+    ``baseDir`` is the folder of Label.txt, images are found at
+    ``dirname(baseDir)/idx``. Keys without labels are skipped.
+    """
+
+    # images submitted per worker ahead of the one being collected
+    QUEUE_DEPTH = 4
+
+    def __init__(self, baseDir, labels, keys, workers=None):
+        self.baseDir = baseDir
+        self.workers = workers or os.cpu_count() or 1
+        self.cropDir = os.path.join(baseDir, CROP_DIR)
+        self.recGtPath = os.path.join(baseDir, REC_GT)
+        self.stagingDir = os.path.join(self.cropDir, STAGING_NAME)
+        root = os.path.dirname(baseDir)
+        self.jobs = [
+            (root + "/" + key, key, labels[key]) for key in keys if key in labels
+        ]
+        self.failed = []
+        self.crops = 0
+        # images whose crops were written by the last run
+        self.exported = 0
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def run(self, progress=None, full=False):
+        """Export what changed, return False if ``progress(done)`` asked to stop.
+
+        ``progress`` is called with the number of images done, also while
+        waiting for a slow image, and returns False to cancel. ``full``
+        ignores the manifest and writes every crop again.
+        """
+        self.failed = []
+        self.crops = 0
+        self.exported = 0
+        tmpPath = self.recGtPath + ".tmp"
+        old = {} if full else loadManifest(self.cropDir)
+        # left over from an export that crashed
+        shutil.rmtree(self.stagingDir, ignore_errors=True)
+        # may create crop_img/ in the image folder
+        with keepListing(self.baseDir):
+            os.makedirs(self.stagingDir)
+        manifest = {}
+        # crops written by this run, moved out of staging at the end
+        staged = []
+        errored = set()
+        workers = min(self.workers, len(self.jobs))
+        if workers > 1:
+            # spawn, forking a process that runs Qt and helper threads is unsafe
+            context = multiprocessing.get_context("spawn")
+            pool = ProcessPoolExecutor(workers, mp_context=context)
+            submit = pool.submit
+        else:
+            # starting a process costs more than a single worker gains
+            pool = None
+            submit = _runNow
+        pending = deque()
+        jobs = iter(self.jobs)
+        done = 0
+        lastProgress = 0
+        try:
+            while True:
+                while len(pending) < max(workers, 1) * self.QUEUE_DEPTH:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    args = job + (self.cropDir, self.stagingDir, old.get(job[1]))
+                    pending.append((job[1], submit(_exportJob, args)))
+                if not pending:
+                    break
+                key, future = pending[0]
+                wait([future], timeout=0.1)
+                if future.done():
+                    pending.popleft()
+                    result, error = future.result()
+                    if error is not None:
+                        print("Can not export crops of", key, error)
+                        self.failed.append(key)
+                        errored.add(key)
+                        if key in old:
+                            # still owns the crops of the last export
+                            manifest[key] = old[key]
+                    else:
+                        digest, written, bad, changed = result
+                        if bad:
+                            print("Can not crop boxes of", key, ", ".join(bad))
+                            self.failed.append(key)
+                            # no hash, the image is tried again next time
+                            digest = None
+                        manifest[key] = [digest, written]
+                        if changed:
+                            staged.extend(written)
+                            self.exported += 1
+                    done += 1
+                # redrawing the dialog for every image would cost more than the export
+                now = time.perf_counter()
+                if progress is not None and (now - lastProgress > 0.05 or not pending):
+                    lastProgress = now
+                    if progress(done) is False:
+                        return False
+
+            lines = []
+            for _, key, labels in self.jobs:
+                if key in manifest and key not in errored:
+                    lines.extend(recLines(key, labels, set(manifest[key][1])))
+            self.crops = len(lines)
+            for name in staged:
+                os.replace(
+                    os.path.join(self.stagingDir, name),
+                    os.path.join(self.cropDir, name),
+                )
+            with keepListing(self.baseDir):
+                with open(tmpPath, "w", encoding="utf-8") as f:
+                    f.writelines(lines)
+                os.replace(tmpPath, self.recGtPath)
+            self._removeStale(old, manifest)
+            saveManifest(self.cropDir, manifest)
+            return True
+        finally:
+            for _, future in pending:
+                future.cancel()
+            if pool is not None:
+                pool.shutdown(wait=True)
+            if os.path.exists(tmpPath):
+                with keepListing(self.baseDir):
+                    os.remove(tmpPath)
+            shutil.rmtree(self.stagingDir, ignore_errors=True)
+
+    def _removeStale(self, old, manifest):
+        """Delete the crops of the last export that no image owns any more."""
+        kept = set()
+        for _, names in manifest.values():
+            kept.update(names)
+        for _, names in old.values():
+            for name in names:
+                if name not in kept:
+                    try:
+                        os.remove(os.path.join(self.cropDir, name))
+                    except OSError:
+                        pass
@@ -0,0 +1,143 @@
+"""Listing of the images of a folder, off the GUI thread.
+
+The listing is built with ``os.scandir`` and persisted next to fileState.txt
+together with the folder's mtime. Reopening a folder whose mtime did not
+change reads the persisted names instead of listing the folder again, which
+matters most on network file systems. PPOCRLabel's own label files live in the
+same folder, writes of them go through ``keepListing`` (libs/imageFolder.py).
+"""
+import json
+import os
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QImageReader
+
+from libs.imageFolder import (
+    _STAMP,
+    _STAMP_SIZE,
+    _dirMtime,
+    _restamp,
+    iterImages,
+    listingPath,
+    sortImages,
+)
+
+_LISTING_VERSION = 2
+
+_extensions = None
+
+
+def imageExtensions():
+    """Lower case extensions Qt can read, as a tuple for ``str.endswith``."""
+    global _extensions
+    if _extensions is None:
+        _extensions = tuple(
+            sorted(
+                ".%s" % fmt.data().decode("ascii").lower()
+                for fmt in QImageReader.supportedImageFormats()
+            )
+        )
+    return _extensions
+
+
+def loadListing(folderPath, extensions, naturalSort):
+    """Return the persisted image names if the folder is unchanged, else None."""
+    try:
+        with open(listingPath(folderPath), "rb") as f:
+            stamp = int(f.read(_STAMP_SIZE))
+            if stamp != _dirMtime(folderPath):
+                return None
+            listing = json.loads(f.read().decode("utf-8"))
+        if (
+            listing.get("version") != _LISTING_VERSION
+            or listing.get("extensions") != list(extensions)
+            or listing.get("natural_sort") != naturalSort
+        ):
+            return None
+        return listing["names"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        return None
+
+
+def saveListing(folderPath, extensions, naturalSort, names):
+    listing = {
+        "version": _LISTING_VERSION,
+        "extensions": list(extensions),
+        "natural_sort": naturalSort,
+        "names": names,
+    }
+    path = listingPath(folderPath)
+    tmpPath = path + ".tmp"
+    try:
+        with open(tmpPath, "wb") as f:
+            f.write((_STAMP % 0).encode("ascii"))
+            f.write(json.dumps(listing, ensure_ascii=False).encode("utf-8"))
+        os.replace(tmpPath, path)
+        # writing the listing changed the folder, stamp it with the result
+        _restamp(folderPath, 0, _dirMtime(folderPath))
+    except OSError as e:
+        # only a cache, read-only folders still open
+        print("Can not write image listing", path, e)
+
+
+class DirScanner(QThread):
+    """List the images of ``folderPath`` on a worker thread.
+
+    ``batchReady`` delivers unsorted absolute paths while the folder is being
+    read, ``scanFinished`` the complete sorted list.
+    """
+
+    batchReady = pyqtSignal(list)
+    scanFinished = pyqtSignal(list)
+
+    BATCH_SIZE = 2000
+
+    def __init__(self, folderPath, naturalSort=True, parent=None):
+        super(DirScanner, self).__init__(parent)
+        self.folderPath = folderPath
+        self.naturalSort = naturalSort
+        self.extensions = imageExtensions()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        base = os.path.abspath(self.folderPath)
+        names = loadListing(base, self.extensions, self.naturalSort)
+        if names is not None:
+            self.scanFinished.emit([os.path.join(base, name) for name in names])
+            return
+
+        try:
+            dirMtime = _dirMtime(base)
+            images = []
+            batch = []
+            for path in iterImages(base, self.extensions):
+                if self._cancelled:
+                    return
+                batch.append(path)
+                if len(batch) >= self.BATCH_SIZE:
+                    images.extend(batch)
+                    self.batchReady.emit(batch)
+                    batch = []
+            if batch:
+                images.extend(batch)
+                self.batchReady.emit(batch)
+        except OSError as e:
+            print("Can not list", base, e)
+            self.scanFinished.emit([])
+            return
+
+        sortImages(images, self.naturalSort)
+        self.scanFinished.emit(images)
+
+        if dirMtime is None or _dirMtime(base) != dirMtime:
+            # the folder changed while it was being listed
+            return
+        saveListing(
+            base,
+            self.extensions,
+            self.naturalSort,
+            [os.path.basename(path) for path in images],
+        )
@@ -0,0 +1,58 @@
+import os
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+
+from libs.utils import newIcon
+
+
+class FileListModel(QAbstractListModel):
+    """Rows of the file list dock, produced on demand from the image list.
+
+    Nothing is created per image: the name, tooltip and done icon of a row are
+    computed in ``data()`` when the view paints it. ``isDone(path)`` decides
+    which icon a row gets.
+    """
+
+    def __init__(self, isDone=None, parent=None):
+        super(FileListModel, self).__init__(parent)
+        self._images = []
+        self._isDone = isDone if isDone is not None else (lambda path: False)
+        self._doneIcon = newIcon("done")
+        self._closeIcon = newIcon("close")
+
+    def setImages(self, images):
+        self.beginResetModel()
+        self._images = images
+        self.endResetModel()
+
+    def appendImages(self, paths):
+        """Add rows at the end, the image list is shared with the caller."""
+        if not paths:
+            return
+        first = len(self._images)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        self._images.extend(paths)
+        self.endInsertRows()
+
+    def path(self, row):
+        return self._images[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._images)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._images):
+            return None
+        path = self._images[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.DecorationRole:
+            return self._doneIcon if self._isDone(path) else self._closeIcon
+        if role in (Qt.ToolTipRole, Qt.UserRole):
+            return path
+        return None
+
+    def refreshRow(self, row):
+        """Repaint one row after its done state changed."""
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
@@ -0,0 +1,155 @@
+"""Box geometry on arrays of many polygons at once.
+
+Quads are ``(N, 4, 2)`` arrays. The per-box arithmetic of cropping (point
+order, crop size, perspective matrix) is done for all boxes in a few NumPy
+operations, leaving ``cv2.warpPerspective`` as the only per-box work.
+"""
+import cv2
+import numpy as np
+
+# crops this much taller than wide are turned to lie horizontally
+TALL_CROP_RATIO = 1.5
+
+
+def fixOrientation(quads):
+    """Copy of ``quads`` with points 1 and 3 swapped in counterclockwise ones."""
+    quads = np.array(quads, np.float32)
+    if quads.size == 0:
+        return quads.reshape(0, 4, 2)
+    if quads.ndim != 3 or quads.shape[1:] != (4, 2):
+        # polygons must not be reshaped into made-up quads, see cropPolygons
+        raise ValueError("Expected quads of shape (N, 4, 2), got %s" % (quads.shape,))
+    x, y = quads[..., 0], quads[..., 1]
+    nx, ny = np.roll(x, -1, axis=1), np.roll(y, -1, axis=1)
+    # Green's theorem, negative when the points run counterclockwise
+    d = (-0.5 * (ny + y) * (nx - x)).sum(axis=1)
+    ccw = d < 0
+    quads[ccw] = quads[ccw][:, [0, 3, 2, 1]]
+    return quads
+
+
+def cropSizes(quads):
+    """``(widths, heights)`` of the crops, the longer of each pair of opposite edges."""
+    edges = np.linalg.norm(quads - np.roll(quads, -1, axis=1), axis=2)
+    widths = np.maximum(edges[:, 0], edges[:, 2]).astype(np.int64)
+    heights = np.maximum(edges[:, 3], edges[:, 1]).astype(np.int64)
+    return widths, heights
+
+
+def perspectiveMatrices(quads, widths, heights):
+    """3x3 matrices mapping each quad onto its ``width`` x ``height`` crop.
+
+    The same linear system cv2.getPerspectiveTransform solves, for all quads
+    in one ``np.linalg.solve``.
+    """
+    n = len(quads)
+    src = quads.astype(np.float64)
+    dst = np.zeros((n, 4, 2))
+    dst[:, 1, 0] = widths
+    dst[:, 2, 0] = widths
+    dst[:, 2, 1] = heights
+    dst[:, 3, 1] = heights
+    x, y = src[..., 0], src[..., 1]
+    u, v = dst[..., 0], dst[..., 1]
+    ones, zeros = np.ones((n, 4)), np.zeros((n, 4))
+    a = np.empty((n, 8, 8))
+    a[:, :4] = np.stack([x, y, ones, zeros, zeros, zeros, -x * u, -y * u], axis=2)
+    a[:, 4:] = np.stack([zeros, zeros, zeros, x, y, ones, -x * v, -y * v], axis=2)
+    b = np.concatenate([u, v], axis=1)
+    matrices = np.ones((n, 9))
+    ok = np.abs(np.linalg.det(a)) > 1e-12
+    matrices[ok, :8] = np.linalg.solve(a[ok], b[ok][..., None])[..., 0]
+    matrices = matrices.reshape(n, 3, 3)
+    # degenerate quads get whatever OpenCV makes of them
+    for i in np.flatnonzero(~ok):
+        matrices[i] = cv2.getPerspectiveTransform(
+            quads[i], dst[i].astype(np.float32)
+        )
+    return matrices
+
+
+def cropImages(img, quads):
+    """Perspective crops of ``quads`` from ``img``, None for empty boxes."""
+    quads = fixOrientation(quads)
+    if not len(quads):
+        return []
+    widths, heights = cropSizes(quads)
+    matrices = perspectiveMatrices(quads, widths, heights)
+    crops = []
+    for m, w, h in zip(matrices, widths.tolist(), heights.tolist()):
+        if w <= 0 or h <= 0:
+            crops.append(None)
+            continue
+        crop = cv2.warpPerspective(
+            img, m, (w, h), borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC
+        )
+        if h * 1.0 / w >= TALL_CROP_RATIO:
+            crop = np.rot90(crop)
+        crops.append(crop)
+    return crops
+
+
+def cropPolygons(img, polys):
+    """Crops of point lists of any length, one per polygon.
+
+    Polygons of more than four points are cropped along their min area quad,
+    as re-recognition does. Boxes of fewer than four points give None.
+    """
+    polys = [np.asarray(poly, np.float32).reshape(-1, 2) for poly in polys]
+    usable = [i for i, poly in enumerate(polys) if len(poly) >= 4]
+    quads = np.array(quadBoxes([polys[i] for i in usable]), np.float32)
+    crops = [None] * len(polys)
+    for i, crop in zip(usable, cropImages(img, quads)):
+        crops[i] = crop
+    return crops
+
+
+def minAreaQuads(polys):
+    """Min area quad of each polygon, as int point lists.
+
+    The quad starts at the corner that best matches the polygon's first
+    point, its middle two points and its last point.
+    """
+    if not len(polys):
+        return []
+    polys = [np.asarray(poly) for poly in polys]
+    boxes = np.array(
+        [cv2.boxPoints(cv2.minAreaRect(poly.astype(np.int32))) for poly in polys]
+    )
+    anchors = np.array(
+        [
+            [poly[0], poly[len(poly) // 2 - 1], poly[len(poly) // 2], poly[-1]]
+            for poly in polys
+        ],
+        np.float64,
+    )
+    # rotations[i, j] is the box corner matched to anchor j when starting at i
+    rotations = (np.arange(4)[:, None] + np.arange(4)[None, :]) % 4
+    dists = np.linalg.norm(boxes[:, rotations] - anchors[:, None], axis=3).sum(axis=2)
+    first = np.where(dists.min(axis=1) < 1e4, dists.argmin(axis=1), 0)
+    quads = boxes[np.arange(len(boxes))[:, None], rotations[first]]
+    return quads.astype(np.int64).tolist()
+
+
+def quadBoxes(boxes):
+    """Boxes as 4-point int lists, longer polygons replaced by their min area quad."""
+    boxes = list(boxes)
+    polys = [i for i, box in enumerate(boxes) if len(box) > 4]
+    for i, quad in zip(polys, minAreaQuads([boxes[i] for i in polys])):
+        boxes[i] = quad
+    assert all(len(box) == 4 for box in boxes)
+    return boxes
+
+
+def boundingStats(polys):
+    """``(center_x, center_y, area)`` arrays for polygons of equal length.
+
+    The center is the one of the bounding rectangle, the area the polygon's.
+    """
+    polys = np.asarray(polys, np.float64)
+    x, y = polys[..., 0], polys[..., 1]
+    nx, ny = np.roll(x, -1, axis=1), np.roll(y, -1, axis=1)
+    area = np.abs((x * ny - nx * y).sum(axis=1)) / 2.0
+    centerX = (x.min(axis=1) + x.max(axis=1)) / 2
+    centerY = (y.min(axis=1) + y.max(axis=1)) / 2
+    return centerX, centerY, area
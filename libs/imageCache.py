@@ -0,0 +1,110 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+def decodeImage(path):
+    """Read an image as a BGR array, like every other place in PPOCRLabel does."""
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class ImageCache(object):
+    """Decoded images keyed by ``(path, mtime_ns)``, bounded by their size in bytes.
+
+    ``prefetch`` decodes images on a small thread pool (cv2 releases the GIL
+    while decoding) so that moving to a neighbour is a cache hit. The cached
+    arrays are handed out without a copy and must not be modified in place.
+    """
+
+    def __init__(self, maxBytes=1 << 30, workers=2):
+        self.maxBytes = maxBytes
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="prefetch")
+
+    @staticmethod
+    def _key(path):
+        try:
+            return path, os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, path):
+        """Return the BGR array of ``path``, decoding it now on a miss."""
+        key = self._key(path)
+        if key is None:
+            return None
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+            future = self._pending.get(key)
+        if future is not None:
+            try:
+                image = future.result()
+            except Exception:
+                image = None
+            if image is not None:
+                return image
+        image = decodeImage(path)
+        self._put(key, image)
+        return image
+
+    def prefetch(self, paths):
+        """Decode ``paths`` in the background, dropping queued work for other paths."""
+        keys = [key for key in map(self._key, paths) if key is not None]
+        wanted = set(keys)
+        with self._lock:
+            for key, future in list(self._pending.items()):
+                if key not in wanted and future.cancel():
+                    del self._pending[key]
+            for key in keys:
+                if key in self._images or key in self._pending:
+                    continue
+                self._pending[key] = self._pool.submit(self._load, key)
+
+    def _load(self, key):
+        try:
+            image = decodeImage(key[0])
+            self._put(key, image)
+            return image
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _put(self, key, image):
+        if image is None or image.nbytes > self.maxBytes:
+            return
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._images[key] = image
+            self._bytes += image.nbytes
+            while self._bytes > self.maxBytes:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def invalidate(self, path):
+        with self._lock:
+            for key in [key for key in self._images if key[0] == path]:
+                self._bytes -= self._images.pop(key).nbytes
+
+    def clear(self):
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            self._images.clear()
+            self._bytes = 0
+
+    def close(self):
+        self.clear()
+        self._pool.shutdown(wait=False)
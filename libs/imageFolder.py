@@ -0,0 +1,108 @@
+"""Image folder helpers shared by the GUI and the headless tools, no Qt needed."""
+import os
+import platform
+import re
+from contextlib import contextmanager
+
+# used when Qt is not there to tell which formats it can read
+IMAGE_EXTENSIONS = (
+    ".bmp",
+    ".jpeg",
+    ".jpg",
+    ".png",
+    ".tif",
+    ".tiff",
+    ".webp",
+)
+
+_DIGITS = re.compile("([0-9]+)")
+
+# listing of the images of a folder persisted by libs/dirScanner.py
+LISTING_NAME = ".imageList.json"
+# the first line of the listing holds the folder mtime it is valid for, fixed
+# width so it can be updated in place without touching the folder itself
+_STAMP = "%020d\n"
+_STAMP_SIZE = len(_STAMP % 0)
+
+
+def _naturalKey(path):
+    return [
+        int(text) if text.isdigit() else text for text in _DIGITS.split(path.lower())
+    ]
+
+
+def sortImages(images, naturalSort=True):
+    """Sort paths in place, ``img2`` before ``img10`` when ``naturalSort`` is set."""
+    images.sort(key=_naturalKey if naturalSort else None)
+    return images
+
+
+def iterImages(folderPath, extensions=IMAGE_EXTENSIONS):
+    """Yield the paths of the image files directly inside ``folderPath``."""
+    with os.scandir(folderPath) as it:
+        for entry in it:
+            if not entry.name.lower().endswith(extensions):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            yield entry.path
+
+
+def imageLabelIdx(filePath):
+    """Key of an image in Label.txt / Cache.cach / fileState.txt: ``folder/name``."""
+    if platform.system() == "Windows":
+        spliter = "\\"
+    else:
+        spliter = "/"
+    filepathsplit = filePath.split(spliter)[-2:]
+    if len(filepathsplit) == 1:
+        return filePath
+    return filepathsplit[0] + "/" + filepathsplit[1]
+
+
+def listingPath(folderPath):
+    return os.path.join(folderPath, LISTING_NAME)
+
+
+def _dirMtime(folderPath):
+    try:
+        return os.stat(folderPath).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _restamp(folderPath, before, after):
+    """Move the listing from folder mtime ``before`` to ``after``."""
+    if after is None:
+        return
+    try:
+        with open(listingPath(folderPath), "r+b") as f:
+            if int(f.read(_STAMP_SIZE)) != before:
+                return
+            f.seek(0)
+            f.write((_STAMP % after).encode("ascii"))
+    except (OSError, ValueError):
+        pass
+
+
+@contextmanager
+def keepListing(folderPath):
+    """Keep the listing of ``folderPath`` valid across writes of PPOCRLabel's own files.
+
+    Only use it around writes that do not add or remove images. A listing
+    that was stale before the block stays stale. The folder mtime can not
+    tell our changes from others though: an image added or removed by
+    someone else while the block runs is taken for one of our writes, and
+    the listing misses it until the folder changes again. Keep the block to
+    the creating, renaming and deleting of files, not to the work around it.
+    """
+    before = _dirMtime(folderPath)
+    try:
+        yield
+    finally:
+        after = _dirMtime(folderPath)
+        if before is not None and after != before:
+            _restamp(folderPath, before, after)
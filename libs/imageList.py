@@ -0,0 +1,65 @@
+from collections.abc import Sequence
+
+
+class ImageList(Sequence):
+    """Ordered list of image paths with a path -> row dict kept in sync.
+
+    ``index`` and ``in`` are dict lookups, so navigating a folder costs the
+    same whatever its size. Slicing returns a plain list.
+    """
+
+    def __init__(self, paths=()):
+        self._paths = []
+        self._rows = {}
+        self.extend(paths)
+
+    def __getitem__(self, i):
+        return self._paths[i]
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __contains__(self, path):
+        return path in self._rows
+
+    def __eq__(self, other):
+        if isinstance(other, ImageList):
+            other = other._paths
+        return self._paths == other
+
+    def __repr__(self):
+        return "ImageList(%d images)" % len(self._paths)
+
+    def index(self, path, start=0, stop=None):
+        try:
+            row = self._rows[path]
+        except (KeyError, TypeError):
+            raise ValueError("%r is not in image list" % (path,))
+        if row < start or (stop is not None and row >= stop):
+            raise ValueError("%r is not in image list" % (path,))
+        return row
+
+    def append(self, path):
+        if path in self._rows:
+            return
+        self._rows[path] = len(self._paths)
+        self._paths.append(path)
+
+    def extend(self, paths):
+        for path in paths:
+            self.append(path)
+
+    def remove(self, path):
+        row = self.index(path)
+        del self._paths[row]
+        del self._rows[path]
+        # only the rows after the removed one move
+        for i in range(row, len(self._paths)):
+            self._rows[self._paths[i]] = i
+
+    def clear(self):
+        self._paths = []
+        self._rows = {}
@@ -0,0 +1,132 @@
+"""Tiled mipmaps for drawing very large images on the canvas."""
+import math
+from collections import OrderedDict
+
+from PyQt5.QtCore import QRect, QRectF, QSize, Qt
+from PyQt5.QtGui import QPixmap
+
+# images with more pixels than this get a pyramid instead of one QPixmap
+PYRAMID_MIN_PIXELS = 16 * 1024 * 1024
+
+
+def canvasPixmap(image, owner=None):
+    """What the canvas should draw for ``image``: a QPixmap for ordinary
+    images, an ImagePyramid for very large ones.
+
+    ``owner`` is kept alive with the pyramid, pass the array ``image`` wraps.
+    """
+    if image.width() * image.height() < PYRAMID_MIN_PIXELS:
+        return QPixmap.fromImage(image)
+    return ImagePyramid(image, owner=owner)
+
+
+class ImagePyramid(object):
+    """Stand-in for the canvas QPixmap of a very large image.
+
+    Level ``k`` is the image scaled down by ``2 ** k``, made the first time a
+    zoom level needs it. Levels are cut into square tiles that are turned into
+    pixmaps when they become visible, and kept in a LRU bounded in bytes.
+    Only the tiles of the exposed area are drawn, from the smallest level
+    that is still sharp at the current scale.
+    """
+
+    def __init__(self, image, owner=None, tileSize=512, cacheBytes=256 << 20):
+        self._levels = [image]
+        self._owner = owner
+        self.tileSize = tileSize
+        self.cacheBytes = cacheBytes
+        self._tiles = OrderedDict()
+        self._bytes = 0
+
+    # the parts of the QPixmap interface the canvas uses
+    def width(self):
+        return self._levels[0].width()
+
+    def height(self):
+        return self._levels[0].height()
+
+    def size(self):
+        return QSize(self.width(), self.height())
+
+    def isNull(self):
+        return self._levels[0].isNull()
+
+    def __bool__(self):
+        return not self.isNull()
+
+    def levelFor(self, scale):
+        """Smallest level with at least one image pixel per screen pixel."""
+        level = 0
+        while 0.5 ** (level + 1) >= scale and max(
+            self.width(), self.height()
+        ) >> (level + 1) >= self.tileSize:
+            level += 1
+        return level
+
+    def level(self, k):
+        while len(self._levels) <= k:
+            prev = self._levels[-1]
+            self._levels.append(
+                prev.scaled(
+                    max(1, prev.width() // 2),
+                    max(1, prev.height() // 2),
+                    Qt.IgnoreAspectRatio,
+                    Qt.SmoothTransformation,
+                )
+            )
+        return self._levels[k]
+
+    def tile(self, k, tx, ty):
+        key = (k, tx, ty)
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+            return pixmap
+        size = self.tileSize
+        image = self.level(k)
+        # copy() pads past the edges, the last row and column are smaller
+        rect = QRect(tx * size, ty * size, size, size).intersected(image.rect())
+        pixmap = QPixmap.fromImage(image.copy(rect))
+        self._tiles[key] = pixmap
+        self._bytes += pixmap.width() * pixmap.height() * 4
+        while self._bytes > self.cacheBytes and len(self._tiles) > 1:
+            _, old = self._tiles.popitem(last=False)
+            self._bytes -= old.width() * old.height() * 4
+        return pixmap
+
+    def draw(self, painter, exposed, scale):
+        """Draw the tiles covering ``exposed``, a rect in full image coordinates."""
+        k = self.levelFor(scale)
+        image = self.level(k)
+        factor = 2**k
+        size = self.tileSize
+        span = size * factor
+        x1 = max(0, int(math.floor(exposed.left() / span)))
+        y1 = max(0, int(math.floor(exposed.top() / span)))
+        x2 = min((image.width() - 1) // size, int(math.floor(exposed.right() / span)))
+        y2 = min((image.height() - 1) // size, int(math.floor(exposed.bottom() / span)))
+        # tiles land on whole device pixels, fractional edges leave seams
+        transform = painter.transform()
+        painter.save()
+        painter.resetTransform()
+        for ty in range(y1, y2 + 1):
+            for tx in range(x1, x2 + 1):
+                pixmap = self.tile(k, tx, ty)
+                # level pixels cover factor x factor full resolution pixels
+                target = transform.mapRect(
+                    QRectF(
+                        tx * span,
+                        ty * span,
+                        pixmap.width() * factor,
+                        pixmap.height() * factor,
+                    )
+                )
+                left, top = round(target.left()), round(target.top())
+                target = QRectF(
+                    left,
+                    top,
+                    round(target.right()) - left,
+                    round(target.bottom()) - top,
+                )
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+        painter.restore()
@@ -0,0 +1,524 @@
+"""Streaming reader / writer for Label.txt and Cache.cach.
+
+Every line of these files is ``<image idx>\\t<json list of boxes>``. Opening a
+folder only scans the line offsets (or reads them from a sidecar index written
+next to the label file); the JSON of an entry is parsed the first time the
+entry is accessed.
+"""
+import ast
+import contextlib
+import json
+import os
+import struct
+import threading
+import traceback
+import weakref
+from array import array
+from collections.abc import MutableMapping
+
+from libs.imageFolder import keepListing
+
+INDEX_SUFFIX = ".idx"
+
+_INDEX_MAGIC = b"PPLI"
+_INDEX_VERSION = 1
+# magic, version, label file size, label file mtime_ns, number of entries
+_INDEX_HEADER = struct.Struct("<4sIqqI")
+
+_sources = weakref.WeakValueDictionary()
+_sourcesLock = threading.Lock()
+
+
+def _normpath(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def parseLabel(text):
+    """Parse the label column of one line, JSON first and Python literal as fallback."""
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # Files written by older versions may hold Python literals instead of JSON
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        pass
+    try:
+        text = text.replace("false", "False")
+        text = text.replace("true", "True")
+        text = text.replace("null", "None")
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        print("Can not parse label:", text[:100])
+        return []
+
+
+class _LabelSource(object):
+    """Random access to the raw label column of one label file."""
+
+    def __init__(self, path):
+        self.path = path
+        # id(LabelDict) -> LabelDict holding entries of this file
+        self.owners = weakref.WeakValueDictionary()
+        self._file = None
+        self._detached = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, path):
+        key = _normpath(path)
+        with _sourcesLock:
+            source = _sources.get(key)
+            if source is None:
+                source = cls(path)
+                _sources[key] = source
+            return source
+
+    def read(self, offset, length):
+        """Return the bytes at ``offset``, or None once the source is detached."""
+        with self._lock:
+            if self._detached:
+                return None
+            if self._file is None:
+                self._file = open(self.path, "rb")
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def __del__(self):
+        # the last dict holding entries of this file is gone; an open handle
+        # would also keep a replaced label file alive on Windows
+        if self._file is not None:
+            self._file.close()
+
+    def detach(self):
+        """Copy every entry still pointing into this file to memory and close it."""
+        for owner in list(self.owners.values()):
+            owner._materialize(self)
+        with self._lock:
+            self._detached = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        with _sourcesLock:
+            if _sources.get(_normpath(self.path)) is self:
+                del _sources[_normpath(self.path)]
+
+
+class _RawEntry(object):
+    """An entry whose label column has not been parsed yet.
+
+    ``loc`` is a ``(source, offset, length)`` tuple, or None once the bytes
+    were copied to ``data``. Both are swapped as whole attributes so that a
+    reader on another thread never sees a half updated location.
+    """
+
+    __slots__ = ("loc", "data")
+
+    def __init__(self, source, offset, length, data=None):
+        self.loc = (source, offset, length) if source is not None else None
+        self.data = data
+
+    @property
+    def source(self):
+        loc = self.loc
+        return loc[0] if loc is not None else None
+
+    def raw(self):
+        while True:
+            loc = self.loc
+            if loc is not None:
+                data = loc[0].read(loc[1], loc[2])
+                if data is not None:
+                    return data
+            data = self.data
+            if data is not None:
+                return data
+            if self.loc is loc:
+                raise RuntimeError("Label entry lost its source file")
+
+    def rebind(self, source, offset, length):
+        self.loc = (source, offset, length)
+        self.data = None
+
+
+class LabelDict(MutableMapping):
+    """Ordered ``{image idx: [box, ...]}`` mapping whose values are parsed on access."""
+
+    def __init__(self):
+        self._data = {}
+        # the dict this one was copied from, it shares our unparsed entries
+        self._origin = None
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        if isinstance(value, _RawEntry):
+            value = parseLabel(value.raw())
+            self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return "LabelDict(%d entries)" % len(self._data)
+
+    def _addRaw(self, key, entry):
+        if entry.source is not None:
+            entry.source.owners[id(self)] = self
+        self._data[key] = entry
+
+    def _materialize(self, source):
+        # list() copies the values in one step, the GUI thread may be
+        # adding entries while a background save detaches a source
+        for value in list(self._data.values()):
+            if isinstance(value, _RawEntry) and value.source is source:
+                value.data = value.raw()
+                value.loc = None
+
+    def copy(self):
+        new = LabelDict()
+        new.update(self)
+        new._origin = weakref.ref(self)
+        return new
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, LabelDict):
+            # keep unparsed entries unparsed
+            for key, value in other._data.items():
+                if isinstance(value, _RawEntry):
+                    self._addRaw(key, value)
+                else:
+                    self._data[key] = value
+            other = ()
+        super(LabelDict, self).update(other, **kwargs)
+
+    def rawItems(self, keys=None):
+        """Yield ``(key, label column as utf-8 bytes)`` without parsing anything."""
+        for key in self._data if keys is None else keys:
+            value = self._data[key]
+            if isinstance(value, _RawEntry):
+                yield key, value.raw().rstrip(b"\r")
+            else:
+                yield key, json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    def save(self, path, keys=None, skipEmpty=False):
+        """Atomically rewrite ``path`` with the given keys (all keys by default).
+
+        Safe to call from a worker thread on a copy of a dict that the GUI
+        thread keeps using: unparsed entries are shared between the copies and
+        are re-pointed to the new file in place.
+        """
+        tmpPath = path + ".tmp"
+        index = []
+        rebound = []
+        sources = set()
+        offset = 0
+        with open(tmpPath, "wb") as f:
+            for key in self._data if keys is None else keys:
+                value = self._data.get(key)
+                if value is None:
+                    continue
+                if isinstance(value, _RawEntry):
+                    source = value.source
+                    if source is not None:
+                        sources.add(source)
+                    data = value.raw().rstrip(b"\r")
+                else:
+                    data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+                if skipEmpty and data.strip() in (b"", b"[]"):
+                    continue
+                head = key.encode("utf-8") + b"\t"
+                f.write(head)
+                f.write(data)
+                f.write(b"\n")
+                index.append((key, offset + len(head), len(data)))
+                if isinstance(value, _RawEntry):
+                    rebound.append((value, offset + len(head), len(data)))
+                offset += len(head) + len(data) + 1
+
+        oldSource = _sources.get(_normpath(path))
+        if oldSource is not None:
+            oldSource.detach()
+        os.replace(tmpPath, path)
+
+        # point the entries that were written back to the new file; every dict
+        # that shared them with this one has to follow them to the new source
+        newSource = _LabelSource.get(path)
+        owner = self
+        while owner is not None:
+            newSource.owners[id(owner)] = owner
+            owner = owner._origin() if owner._origin is not None else None
+        for source in sources:
+            for owner in list(source.owners.values()):
+                newSource.owners[id(owner)] = owner
+        for entry, start, length in rebound:
+            entry.rebind(newSource, start, length)
+        _writeIndex(path, index)
+
+
+def _scanLabelFile(path):
+    index = []
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            tab = line.find(b"\t")
+            if tab >= 0:
+                end = len(line) - 1 if line.endswith(b"\n") else len(line)
+                index.append(
+                    (line[:tab].decode("utf-8"), offset + tab + 1, end - tab - 1)
+                )
+            offset += len(line)
+    return index
+
+
+def _indexPath(path):
+    return path + INDEX_SUFFIX
+
+
+def _readIndex(path):
+    try:
+        st = os.stat(path)
+        with open(_indexPath(path), "rb") as f:
+            data = f.read()
+        magic, version, size, mtime, count = _INDEX_HEADER.unpack_from(data)
+        if (
+            magic != _INDEX_MAGIC
+            or version != _INDEX_VERSION
+            or size != st.st_size
+            or mtime != st.st_mtime_ns
+        ):
+            return None
+        pos = _INDEX_HEADER.size
+        offsets = array("Q")
+        offsets.frombytes(data[pos : pos + 8 * count])
+        pos += 8 * count
+        lengths = array("Q")
+        lengths.frombytes(data[pos : pos + 8 * count])
+        pos += 8 * count
+        keys = data[pos:].decode("utf-8").split("\n") if count else []
+        if len(keys) != count or len(offsets) != count or len(lengths) != count:
+            return None
+        return list(zip(keys, offsets, lengths))
+    except (OSError, struct.error, UnicodeDecodeError):
+        return None
+
+
+def _writeIndex(path, index):
+    try:
+        st = os.stat(path)
+        offsets = array("Q", (offset for _, offset, _ in index))
+        lengths = array("Q", (length for _, _, length in index))
+        keys = "\n".join(key for key, _, _ in index).encode("utf-8")
+        tmpPath = _indexPath(path) + ".tmp"
+        with keepListing(os.path.dirname(os.path.abspath(path))):
+            with open(tmpPath, "wb") as f:
+                f.write(
+                    _INDEX_HEADER.pack(
+                        _INDEX_MAGIC,
+                        _INDEX_VERSION,
+                        st.st_size,
+                        st.st_mtime_ns,
+                        len(index),
+                    )
+                )
+                f.write(offsets.tobytes())
+                f.write(lengths.tobytes())
+                f.write(keys)
+            os.replace(tmpPath, _indexPath(path))
+    except OSError as e:
+        # the index is only a cache, a read-only folder must still work
+        print("Can not write label index", _indexPath(path), e)
+
+
+def loadLabelFile(path):
+    """Open a label file lazily. A missing file is created empty."""
+    labeldict = LabelDict()
+    if not os.path.exists(path):
+        with keepListing(os.path.dirname(os.path.abspath(path))):
+            open(path, "w", encoding="utf-8").close()
+        return labeldict
+
+    oldSource = _sources.get(_normpath(path))
+    if oldSource is not None:
+        # the file may have been rewritten by someone else since it was opened
+        oldSource.detach()
+
+    index = _readIndex(path)
+    if index is None:
+        index = _scanLabelFile(path)
+        _writeIndex(path, index)
+
+    source = _LabelSource.get(path)
+    for key, offset, length in index:
+        labeldict._addRaw(key, _RawEntry(source, offset, length))
+    return labeldict
+
+
+def appendLabels(path, items):
+    """Append ``(key, label)`` lines to a label file and flush them to disk.
+
+    A later line of the same key replaces an earlier one when the file is
+    loaded, so this can be used to checkpoint updates without a rewrite.
+    """
+    with open(path, "a+b") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        for key, label in items:
+            f.write(key.encode("utf-8") + b"\t")
+            f.write(json.dumps(label, ensure_ascii=False).encode("utf-8"))
+            f.write(b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def saveFileState(path, statedict):
+    """Atomically rewrite fileState.txt from ``{image idx: state}``."""
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "w", encoding="utf-8") as f:
+        for key, state in statedict.items():
+            f.write(key + "\t" + str(state) + "\n")
+    os.replace(tmpPath, path)
+
+
+class LabelJournal(object):
+    """Append-only log of confirmed labels kept next to Label.txt.
+
+    Confirming an image appends one fsync'ed JSON line instead of rewriting
+    Label.txt and fileState.txt. ``compact`` folds the log into those files,
+    records left over from a crash are applied again by ``replay``.
+    """
+
+    SUFFIX = ".journal"
+
+    def __init__(self, labelPath, guard=None):
+        self.path = labelPath + self.SUFFIX
+        # context manager factory wrapped around creating, renaming and
+        # deleting journal files
+        self.guard = guard if guard is not None else contextlib.nullcontext
+        # records that are being folded into Label.txt by a compaction
+        self.oldPath = self.path + ".old"
+        self._file = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def append(self, key, label, state=1):
+        self._write({"key": key, "label": label, "state": state})
+
+    def remove(self, key):
+        self._write({"key": key, "removed": True})
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                with self.guard():
+                    self._file = open(self.path, "ab")
+            self._file.write(line.encode("utf-8"))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def pending(self):
+        """True if some records are not in Label.txt yet."""
+        for path in (self.oldPath, self.path):
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                return True
+        return False
+
+    def replay(self, labeldict, statedict):
+        """Apply the records on disk to the loaded dicts, return how many there were."""
+        count = 0
+        for path in (self.oldPath, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        key = record["key"]
+                    except (ValueError, KeyError, TypeError):
+                        # torn write of the last record before a crash
+                        continue
+                    if record.get("removed"):
+                        labeldict.pop(key, None)
+                        statedict.pop(key, None)
+                    else:
+                        labeldict[key] = record.get("label", [])
+                        statedict[key] = record.get("state", 1)
+                    count += 1
+        return count
+
+    def compact(self, writeSnapshot, background=False):
+        """Start a new log and fold the current one in with ``writeSnapshot()``.
+
+        The caller takes the snapshot before calling this, so every rotated
+        record is contained in it. The rotated records are only deleted once
+        ``writeSnapshot`` has returned.
+        """
+        self.wait()
+        with self._lock, self.guard():
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                if os.path.exists(self.oldPath):
+                    # the last compaction failed, keep its records first
+                    with open(self.oldPath, "ab") as old, open(self.path, "rb") as f:
+                        old.write(f.read())
+                        old.flush()
+                        os.fsync(old.fileno())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.oldPath)
+
+        if background:
+            self._thread = threading.Thread(
+                target=self._fold, args=(writeSnapshot,), daemon=True
+            )
+            self._thread.start()
+        else:
+            self._fold(writeSnapshot)
+
+    def _fold(self, writeSnapshot):
+        try:
+            writeSnapshot()
+        except Exception:
+            print("Can not compact label journal", self.path)
+            traceback.print_exc()
+            return
+        with self.guard():
+            if os.path.exists(self.oldPath):
+                os.remove(self.oldPath)
+
+    def wait(self):
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+            self._thread = None
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,70 @@
+"""Models built on first use, so that the window shows up before paddle loads."""
+import threading
+import traceback
+
+from libs.startupTrace import trace
+
+
+def buildPaddleOCR(params, warmup=None):
+    with trace.phase("import paddleocr"):
+        from paddleocr import PaddleOCR
+
+    with trace.phase("PaddleOCR"):
+        model = PaddleOCR(**params)
+    if warmup is not None:
+        with trace.phase("PaddleOCR warmup"):
+            model.ocr(warmup, cls=True, det=True)
+    return model
+
+
+def buildPPStructure(params, warmup=None):
+    with trace.phase("import paddleocr"):
+        from paddleocr import PPStructure
+
+    with trace.phase("PPStructure"):
+        model = PPStructure(**params)
+    if warmup is not None:
+        with trace.phase("PPStructure warmup"):
+            model(warmup, return_ocr_result_in_table=True)
+    return model
+
+
+def buildBaiduCloudOCR():
+    from libs.baiduCloudOcr import BaiduCloudOCR
+
+    return BaiduCloudOCR()
+
+
+class LazyModel(object):
+    """Hold a model that ``build()`` creates the first time ``get()`` is called.
+
+    ``preload()`` builds it ahead of time on a background thread. If that
+    fails, the error is printed and ``get()`` tries again on the caller's
+    thread, where it is raised.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._model = None
+        self._lock = threading.Lock()
+
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._build()
+        return self._model
+
+    def preload(self):
+        thread = threading.Thread(target=self._preload, name="modelPreload", daemon=True)
+        thread.start()
+        return thread
+
+    def _preload(self):
+        try:
+            self.get()
+        except Exception:
+            traceback.print_exc()
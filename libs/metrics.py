@@ -0,0 +1,141 @@
+"""Latency histograms of the hot paths, cheap enough to be always on.
+
+    from libs.metrics import metrics
+
+    @metrics.timed("loadFile")
+    def loadFile(self, filePath):
+        with metrics.timed("loadFile.decode"):
+            ...
+
+Durations are kept in log scale buckets, a sample costs two clock reads and
+a lock. ``snapshot()`` summarises every operation, ``writeJson()`` exports it.
+"""
+import bisect
+import functools
+import json
+import threading
+import time
+
+# bucket upper bounds in milliseconds, 10us to about 3 minutes, ratio sqrt(2)
+BUCKET_BOUNDS = [0.01 * 2 ** (i / 2.0) for i in range(49)]
+PERCENTILES = (50, 90, 99)
+
+
+class Histogram(object):
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, ms):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the ``p``th percentile, in ms."""
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                bound = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        summary = {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+        }
+        for p in PERCENTILES:
+            summary["p%d" % p] = self.percentile(p)
+        return summary
+
+
+class _Timed(object):
+    """What ``Metrics.timed`` returns, a context manager and a decorator."""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, func):
+        metrics, name = self.metrics, self.name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record(name, time.perf_counter() - start)
+
+        return wrapper
+
+
+class Metrics(object):
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def timed(self, name):
+        return _Timed(self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds * 1000.0)
+
+    def snapshot(self):
+        """``{name: summary}`` of every operation, times in milliseconds."""
+        with self._lock:
+            return {
+                name: histogram.summary()
+                for name, histogram in sorted(self._histograms.items())
+            }
+
+    def histograms(self):
+        """``{name: bucket counts}``, the bounds are ``BUCKET_BOUNDS``."""
+        with self._lock:
+            return {
+                name: list(histogram.buckets)
+                for name, histogram in sorted(self._histograms.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def writeJson(self, path):
+        report = {
+            "unit": "ms",
+            "bucketBounds": BUCKET_BOUNDS,
+            "operations": self.snapshot(),
+            "histograms": self.histograms(),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+metrics = Metrics()
@@ -0,0 +1,93 @@
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (
+    QDockWidget,
+    QFileDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from libs.metrics import PERCENTILES, metrics
+
+COLUMNS = ["count", "mean", "min"] + ["p%d" % p for p in PERCENTILES] + ["max"]
+
+
+class MetricsDock(QDockWidget):
+    """Debug view of the latency histograms in ``libs.metrics``."""
+
+    REFRESH_MS = 1000
+
+    def __init__(self, title="Metrics", parent=None):
+        super(MetricsDock, self).__init__(title, parent)
+        self.setObjectName("Metrics")
+        self.table = QTableWidget(0, len(COLUMNS) + 1)
+        self.table.setHorizontalHeaderLabels(
+            ["operation"] + [c if c == "count" else c + " (ms)" for c in COLUMNS]
+        )
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeToContents
+        )
+
+        resetButton = QPushButton("Reset")
+        resetButton.clicked.connect(self.reset)
+        exportButton = QPushButton("Export JSON")
+        exportButton.clicked.connect(self.export)
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(resetButton)
+        buttons.addWidget(exportButton)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+
+        # only refreshed while shown
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.onVisibilityChanged)
+
+    def onVisibilityChanged(self, visible):
+        if visible:
+            self.refresh()
+            self.timer.start()
+        else:
+            self.timer.stop()
+
+    def refresh(self):
+        snapshot = metrics.snapshot()
+        self.table.setRowCount(len(snapshot))
+        for row, (name, summary) in enumerate(snapshot.items()):
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            for column, key in enumerate(COLUMNS, 1):
+                value = summary[key]
+                if value is None:
+                    text = ""
+                elif key == "count":
+                    text = str(value)
+                else:
+                    text = "%.2f" % value
+                item = QTableWidgetItem(text)
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def reset(self):
+        metrics.reset()
+        self.refresh()
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export metrics", "metrics.json", "JSON (*.json)"
+        )
+        if path:
+            metrics.writeJson(path)
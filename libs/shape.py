@@ -12,13 +12,17 @@
 # THE SOFTWARE.
 # !/usr/bin/python
 # -*- coding: utf-8 -*-
+import logging
 import math
-import sys
 
-from PyQt5.QtCore import QPointF
-from PyQt5.QtGui import QColor, QPen, QPainterPath, QFont
+from PyQt5.QtCore import QPointF, QRectF
+from PyQt5.QtGui import QColor, QPen, QPainterPath, QFont, QFontMetricsF
+from libs.spatialIndex import VersionedList, pointsRect
 from libs.utils import distance
-from ppocr.utils.logging import get_logger
+
+# the logger of paddleocr, configured once it is imported; ppocr itself is
+# only importable after paddleocr and loads paddle, which must stay lazy
+logger = logging.getLogger("ppocr")
 
 DEFAULT_LINE_COLOR = QColor(0, 255, 0, 128)
 DEFAULT_FILL_COLOR = QColor(255, 0, 0, 128)
@@ -29,6 +33,21 @@ DEFAULT_HVERTEX_FILL_COLOR = QColor(255, 0, 0)
 DEFAULT_LOCK_COLOR = QColor(255, 0, 255)
 MIN_Y_LABEL = 10
 
+_fonts = {}
+
+
+def labelFont(family, size):
+    """Bold font of the box labels and indexes, shared by all shapes."""
+    font = _fonts.get((family, size))
+    if font is None:
+        font = QFont()
+        if family is not None:
+            font.setFamily(family)
+        font.setPointSize(size)
+        font.setBold(True)
+        _fonts[(family, size)] = font
+    return font
+
 
 class Shape(object):
     P_SQUARE, P_ROUND = range(2)
@@ -59,6 +78,8 @@ class Shape(object):
     ):
         self.label = label
         self.idx = None  # bbox order, only for table annotation
+        # name -> (key, value) of geometry derived from the points, see _cached
+        self._cache = {}
         self.points = []
         self.fill = False
         self.selected = False
@@ -86,6 +107,27 @@ class Shape(object):
             # is used for drawing the pending line a different color.
             self.line_color = line_color
 
+    @property
+    def points(self):
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        # versioned, so that cached geometry notices in-place edits
+        self._points = VersionedList(points)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_cache"] = {}
+        return state
+
+    def _cached(self, name, key, build):
+        """``build()``, reused as long as ``key`` stays the same."""
+        entry = self._cache.get(name)
+        if entry is None or entry[0] != key:
+            entry = self._cache[name] = (key, build())
+        return entry[1]
+
     def rotate(self, theta):
         for i, p in enumerate(self.points):
             self.points[i] = self.rotatePoint(p, theta)
@@ -109,7 +151,6 @@ class Shape(object):
             )
         except:
             self.center = None
-            logger = get_logger()
             logger.warning("The XY coordinates of QPointF are not detectable!")
         self._closed = True
 
@@ -146,20 +187,12 @@ class Shape(object):
             # pen.setWidth(max(1, int(round(2.0 / self.scale))))
             painter.setPen(pen)
 
-            line_path = QPainterPath()
-            vrtx_path = QPainterPath()
-
-            line_path.moveTo(self.points[0])
-            # Uncommenting the following line will draw 2 paths
-            # for the 1st vertex, and make it non-filled, which
-            # may be desirable.
-            # self.drawVertex(vrtx_path, 0)
-
-            for i, p in enumerate(self.points):
-                line_path.lineTo(p)
-                self.drawVertex(vrtx_path, i)
-            if self.isClosed():
-                line_path.lineTo(self.points[0])
+            line_path = self.linePath()
+            vrtx_path = self.vertexPath()
+            if self._highlightIndex is not None:
+                self.vertex_fill_color = self.hvertex_fill_color
+            else:
+                self.vertex_fill_color = Shape.vertex_fill_color
 
             painter.drawPath(line_path)
             painter.drawPath(vrtx_path)
@@ -167,47 +200,101 @@ class Shape(object):
 
             # Draw text at the top-left
             if self.paintLabel:
-                min_x = sys.maxsize
-                min_y = sys.maxsize
-                for point in self.points:
-                    min_x = min(min_x, point.x())
-                    min_y = min(min_y, point.y())
-                if min_x != sys.maxsize and min_y != sys.maxsize:
-                    font = QFont()
-                    if self.font_family is not None:
-                        font.setFamily(self.font_family)
-                    font.setPointSize(self.fontsize)
-                    font.setBold(True)
-                    painter.setFont(font)
-                    if self.label is None:
-                        self.label = ""
-                    if min_y < MIN_Y_LABEL:
-                        min_y += MIN_Y_LABEL
-                    painter.drawText(min_x, min_y, self.label)
+                if self.label is None:
+                    self.label = ""
+                painter.setFont(labelFont(self.font_family, self.fontsize))
+                painter.drawText(self.textAnchor(), self.label)
 
             # Draw number at the top-right
             if self.paintIdx:
-                min_x = sys.maxsize
-                min_y = sys.maxsize
-                for point in self.points:
-                    min_x = min(min_x, point.x())
-                    min_y = min(min_y, point.y())
-                if min_x != sys.maxsize and min_y != sys.maxsize:
-                    font = QFont()
-                    font.setPointSize(self.fontsize)
-                    font.setBold(True)
-                    painter.setFont(font)
-                    text = ""
-                    if self.idx != None:
-                        text = str(self.idx)
-                    if min_y < MIN_Y_LABEL:
-                        min_y += MIN_Y_LABEL
-                    painter.drawText(int(min_x), int(min_y), text)
+                text = ""
+                if self.idx != None:
+                    text = str(self.idx)
+                painter.setFont(labelFont(None, self.fontsize))
+                anchor = self.textAnchor()
+                painter.drawText(int(anchor.x()), int(anchor.y()), text)
 
             if self.fill:
                 color = self.select_fill_color if self.selected else self.fill_color
                 painter.fillPath(line_path, color)
 
+    def linePath(self):
+        """Outline through the points, closed once the shape is."""
+
+        def build():
+            path = QPainterPath()
+            path.moveTo(self.points[0])
+            for p in self.points:
+                path.lineTo(p)
+            if self.isClosed():
+                path.lineTo(self.points[0])
+            return path
+
+        return self._cached("line", (self._points.version, self._closed), build)
+
+    def vertexPath(self):
+        """Vertex markers, sized for the current ``Shape.scale``."""
+
+        def build():
+            path = QPainterPath()
+            for i in range(len(self.points)):
+                self.drawVertex(path, i)
+            return path
+
+        key = (
+            self._points.version,
+            self.scale,
+            self.point_size,
+            self.point_type,
+            self._highlightIndex,
+            self._highlightMode,
+        )
+        return self._cached("vertex", key, build)
+
+    def textAnchor(self):
+        """Baseline origin of the label and index text."""
+
+        def build():
+            min_x, min_y = pointsRect(self.points)[:2]
+            if min_y < MIN_Y_LABEL:
+                min_y += MIN_Y_LABEL
+            return QPointF(min_x, min_y)
+
+        return self._cached("anchor", self._points.version, build)
+
+    def paintRect(self):
+        """Image area ``paint`` may draw on, to skip shapes out of view."""
+
+        def build():
+            x1, y1, x2, y2 = pointsRect(self.points)
+            # the largest vertex marker is a highlighted round one
+            d = self.point_size / self.scale * 4
+            rect = QRectF(x1, y1, x2 - x1, y2 - y1).adjusted(-d, -d, d, d)
+            texts = []
+            if self.paintLabel:
+                texts.append((self.font_family, self.label or ""))
+            if self.paintIdx:
+                texts.append((None, "" if self.idx is None else str(self.idx)))
+            anchor = self.textAnchor()
+            for family, text in texts:
+                metrics = QFontMetricsF(labelFont(family, self.fontsize))
+                rect = rect.united(
+                    metrics.boundingRect(text)
+                    .translated(anchor)
+                    .adjusted(-2, -2, 2, 2)
+                )
+            return rect
+
+        key = (
+            self._points.version,
+            self.scale,
+            self.point_size,
+            self.paintLabel and (self.font_family, self.label),
+            self.paintIdx and self.idx,
+            self.fontsize,
+        )
+        return self._cached("paintRect", key, build)
+
     def drawVertex(self, path, i):
         d = self.point_size / self.scale
         shape = self.point_type
@@ -215,10 +302,6 @@ class Shape(object):
         if i == self._highlightIndex:
             size, shape = self._highlightSettings[self._highlightMode]
             d *= size
-        if self._highlightIndex is not None:
-            self.vertex_fill_color = self.hvertex_fill_color
-        else:
-            self.vertex_fill_color = Shape.vertex_fill_color
         if shape == self.P_SQUARE:
             path.addRect(point.x() - d / 2, point.y() - d / 2, d, d)
         elif shape == self.P_ROUND:
@@ -236,13 +319,16 @@ class Shape(object):
         return self.makePath().contains(point)
 
     def makePath(self):
-        path = QPainterPath(self.points[0])
-        for p in self.points[1:]:
-            path.lineTo(p)
-        return path
+        def build():
+            path = QPainterPath(self.points[0])
+            for p in self.points[1:]:
+                path.lineTo(p)
+            return path
+
+        return QPainterPath(self._cached("path", self._points.version, build))
 
     def boundingRect(self):
-        return self.makePath().boundingRect()
+        return QRectF(self.makePath().boundingRect())
 
     def moveBy(self, offset):
         self.points = [p + offset for p in self.points]
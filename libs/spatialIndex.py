@@ -0,0 +1,141 @@
+"""Grid index of the canvas shapes for hover and click hit-testing."""
+import math
+
+
+class VersionedList(list):
+    """A list stamped with a new ``version`` whenever it is changed in place.
+
+    Versions come from one counter shared by all lists, so a version never
+    repeats, and ``VersionedList.changes`` tells whether any list changed.
+    """
+
+    changes = 0
+
+    def __init__(self, *args):
+        super(VersionedList, self).__init__(*args)
+        self._changed()
+
+    def _changed(self):
+        VersionedList.changes += 1
+        self.version = VersionedList.changes
+
+
+def _mutator(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args):
+        result = method(self, *args)
+        self._changed()
+        return result
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "sort",
+    "reverse",
+):
+    setattr(VersionedList, _name, _mutator(_name))
+
+
+def pointsRect(points):
+    """``(x1, y1, x2, y2)`` bounds of a list of QPointF, or None if empty."""
+    if not points:
+        return None
+    xs = [p.x() for p in points]
+    ys = [p.y() for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class ShapeIndex(object):
+    """Shapes bucketed by the grid cells their bounding box, grown by
+    ``margin``, overlaps.
+
+    ``sync(shapes)`` brings the grid up to date with the canvas, it only does
+    work when a shape or the list was changed since the last call. A query
+    returns the shapes whose grown box holds the point, topmost first.
+    """
+
+    def __init__(self, cellSize=128, margin=0.0):
+        self.cellSize = float(cellSize)
+        self.margin = margin
+        self._cells = {}
+        # shape -> (points version, grown rect, cells)
+        self._entries = {}
+        self._order = {}
+        self._shapes = None
+        self._changes = None
+
+    def _cellRange(self, rect):
+        x1, y1, x2, y2 = rect
+        size = self.cellSize
+        return (
+            range(int(math.floor(x1 / size)), int(math.floor(x2 / size)) + 1),
+            range(int(math.floor(y1 / size)), int(math.floor(y2 / size)) + 1),
+        )
+
+    def _insert(self, shape, version):
+        rect = pointsRect(shape.points)
+        if rect is None:
+            self._entries[shape] = (version, None, ())
+            return
+        m = self.margin
+        rect = (rect[0] - m, rect[1] - m, rect[2] + m, rect[3] + m)
+        xs, ys = self._cellRange(rect)
+        cells = [(cx, cy) for cx in xs for cy in ys]
+        for cell in cells:
+            self._cells.setdefault(cell, set()).add(shape)
+        self._entries[shape] = (version, rect, cells)
+
+    def _remove(self, shape):
+        _, _, cells = self._entries.pop(shape)
+        for cell in cells:
+            bucket = self._cells[cell]
+            bucket.discard(shape)
+            if not bucket:
+                del self._cells[cell]
+
+    def sync(self, shapes):
+        if shapes is self._shapes and VersionedList.changes == self._changes:
+            return
+        current = set(shapes)
+        for shape in [s for s in self._entries if s not in current]:
+            self._remove(shape)
+        for shape in shapes:
+            version = shape.points.version
+            entry = self._entries.get(shape)
+            if entry is not None:
+                if entry[0] == version:
+                    continue
+                self._remove(shape)
+            self._insert(shape, version)
+        self._order = {shape: i for i, shape in enumerate(shapes)}
+        self._shapes = shapes
+        self._changes = VersionedList.changes
+
+    def query(self, point):
+        size = self.cellSize
+        cell = (int(math.floor(point.x() / size)), int(math.floor(point.y() / size)))
+        x, y = point.x(), point.y()
+        found = [
+            shape
+            for shape in self._cells.get(cell, ())
+            if self._contains(self._entries[shape][1], x, y)
+        ]
+        found.sort(key=self._order.__getitem__, reverse=True)
+        return found
+
+    @staticmethod
+    def _contains(rect, x, y):
+        return rect[0] <= x <= rect[2] and rect[1] <= y <= rect[3]
@@ -0,0 +1,113 @@
+"""Wall-clock trace of the start-up of PPOCRLabel, off unless asked for.
+
+Enable it with ``--startup_trace [report.json]`` or by setting the
+PPOCRLABEL_STARTUP_TRACE environment variable to the report path (or to 1
+for the default path). The report lists every phase with its start, relative
+to the import of this module, and its duration, and is written once the
+window is shown and again at exit, which covers the background model load.
+
+Must be imported before the heavy modules to time them.
+"""
+import atexit
+import contextlib
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+ENV_VAR = "PPOCRLABEL_STARTUP_TRACE"
+FLAG = "--startup_trace"
+DEFAULT_REPORT = "startup_trace.json"
+
+
+def _reportPathFromArgs(argv):
+    for i, arg in enumerate(argv):
+        if arg == FLAG:
+            if i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+                return argv[i + 1]
+            return DEFAULT_REPORT
+        if arg.startswith(FLAG + "="):
+            return arg.split("=", 1)[1] or DEFAULT_REPORT
+    value = os.environ.get(ENV_VAR, "")
+    if value in ("", "0"):
+        return None
+    return DEFAULT_REPORT if value == "1" else value
+
+
+class StartupTrace(object):
+    def __init__(self, reportPath=None):
+        self.reportPath = reportPath
+        self.t0 = time.perf_counter()
+        self.phases = []
+        self.marks = []
+        self._depth = threading.local()
+        self._lock = threading.Lock()
+        if self.enabled:
+            atexit.register(self.write)
+
+    @property
+    def enabled(self):
+        return self.reportPath is not None
+
+    def _now(self):
+        return time.perf_counter() - self.t0
+
+    def phase(self, name):
+        """Context manager timing the ``with`` block as phase ``name``."""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._phase(name)
+
+    @contextlib.contextmanager
+    def _phase(self, name):
+        depth = getattr(self._depth, "value", 0)
+        self._depth.value = depth + 1
+        start = self._now()
+        try:
+            yield
+        finally:
+            self._depth.value = depth
+            with self._lock:
+                self.phases.append(
+                    {
+                        "name": name,
+                        "start": round(start, 4),
+                        "duration": round(self._now() - start, 4),
+                        "depth": depth,
+                        "thread": threading.current_thread().name,
+                    }
+                )
+
+    def mark(self, name):
+        """Record that milestone ``name`` was reached now."""
+        if self.enabled:
+            with self._lock:
+                self.marks.append({"name": name, "time": round(self._now(), 4)})
+
+    def report(self):
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p["start"])
+            marks = list(self.marks)
+        return {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "total": round(self._now(), 4),
+            "marks": marks,
+            "phases": phases,
+        }
+
+    def write(self):
+        if not self.enabled:
+            return
+        try:
+            with open(self.reportPath, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, indent=2)
+        except OSError as e:
+            print("Can not write the startup trace:", e)
+            return
+        print("Startup trace written to", os.path.abspath(self.reportPath))
+
+
+trace = StartupTrace(_reportPathFromArgs(sys.argv[1:]))
@@ -0,0 +1,183 @@
+"""Thumbnails of the icon strip, decoded at reduced size off the GUI thread.
+
+QImageReader is given the thumbnail size before reading, so the JPEG plugin
+decodes with DCT scaling instead of decoding every pixel and scaling down.
+Thumbnails are kept in memory and written to a cache folder under the
+user's home, named after the path, mtime and size of the image, so an image
+that did not change is never decoded for its thumbnail again. The folder is
+kept under a size cap, the thumbnails used least recently are deleted first.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+THUMBNAIL_SIZE = 100
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "PPOCRLabel", "thumbnails")
+# a 100 x 100 thumbnail is 3 to 5 KB, this holds some 50000 of them
+CACHE_BYTES = 200 << 20
+
+
+def thumbnailKey(path):
+    """sha1 of the path, mtime and size of the image, None if it is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    ident = "%s\0%d\0%d" % (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    return hashlib.sha1(ident.encode("utf-8", "surrogateescape")).hexdigest()
+
+
+def readThumbnail(path, size):
+    """``path`` decoded straight to ``size`` x ``size``, a null QImage on failure."""
+    reader = QImageReader(path)
+    if reader.size().isValid():
+        reader.setScaledSize(QSize(size, size))
+    image = reader.read()
+    if not image.isNull() and (image.width(), image.height()) != (size, size):
+        # formats that can not scale while decoding
+        image = image.scaled(size, size, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+    return image
+
+
+class ThumbnailService(QObject):
+    """Hand out thumbnails, loading the missing ones on a thread pool.
+
+    ``get(path)`` returns the QImage when it is in memory and otherwise queues
+    it, ``thumbnailReady`` is emitted on the GUI thread once it is loaded.
+    """
+
+    thumbnailReady = pyqtSignal(str, QImage)
+
+    def __init__(self, size=THUMBNAIL_SIZE, cacheDir=CACHE_DIR, workers=2,
+                 maxImages=1024, cacheBytes=CACHE_BYTES, parent=None):
+        super(ThumbnailService, self).__init__(parent)
+        self.size = size
+        self.cacheDir = cacheDir
+        self.maxImages = maxImages
+        self.cacheBytes = cacheBytes
+        self._images = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        # bytes written to the cache folder since it was last pruned
+        self._written = 0
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="thumbnail")
+        self._pool.submit(self.pruneCache)
+
+    def _cachePath(self, key):
+        return os.path.join(self.cacheDir, key[:2], key + ".jpg")
+
+    def get(self, path):
+        key = thumbnailKey(path)
+        if key is None:
+            return None
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+            if key not in self._pending:
+                self._pending[key] = self._pool.submit(self._load, path, key)
+        return None
+
+    def prefetch(self, paths):
+        """Queue ``paths``, dropping queued work for other paths."""
+        keys = dict((thumbnailKey(path), path) for path in paths)
+        keys.pop(None, None)
+        with self._lock:
+            for key, future in list(self._pending.items()):
+                if key not in keys and future.cancel():
+                    del self._pending[key]
+            for key, path in keys.items():
+                if key not in self._images and key not in self._pending:
+                    self._pending[key] = self._pool.submit(self._load, path, key)
+
+    def _load(self, path, key):
+        try:
+            cachePath = self._cachePath(key)
+            image = QImage(cachePath)
+            if image.isNull():
+                image = readThumbnail(path, self.size)
+                if image.isNull():
+                    return
+                self._save(image, cachePath)
+            else:
+                # the mtime orders the cache files for pruning
+                try:
+                    os.utime(cachePath)
+                except OSError:
+                    pass
+            with self._lock:
+                self._images[key] = image
+                while len(self._images) > self.maxImages:
+                    self._images.popitem(last=False)
+            self.thumbnailReady.emit(path, image)
+        except Exception as e:
+            print("Can not make thumbnail of", path, e)
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _save(self, image, cachePath):
+        tmpPath = "%s.%d.tmp" % (cachePath, threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+            if image.save(tmpPath, "JPG", 90):
+                os.replace(tmpPath, cachePath)
+                with self._lock:
+                    self._written += os.path.getsize(cachePath)
+                    # pruning walks the whole folder, not after every write
+                    prune = self._written > self.cacheBytes // 10
+                    if prune:
+                        self._written = 0
+                if prune:
+                    self.pruneCache()
+        except OSError as e:
+            # only a cache, thumbnails still show without it
+            print("Can not write thumbnail", cachePath, e)
+
+    def pruneCache(self):
+        """Delete the least recently used thumbnails until the cache fits
+        ``cacheBytes`` again, return the number of bytes freed."""
+        files = []
+        total = 0
+        try:
+            for sub in os.scandir(self.cacheDir):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime_ns, st.st_size, entry.path))
+                    total += st.st_size
+        except OSError:
+            # no cache folder yet
+            return 0
+        if total <= self.cacheBytes:
+            return 0
+        files.sort()
+        freed = 0
+        # down to 90% of the cap, so the next prune is not due right away
+        target = total - self.cacheBytes * 9 // 10
+        for _, size, path in files:
+            if freed >= target:
+                break
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        return freed
+
+    def close(self, wait=False):
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self._pool.shutdown(wait=wait)
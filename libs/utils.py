@@ -16,11 +16,12 @@ import re
 import sys
 from math import sqrt
 
-import cv2
 import numpy as np
 from PyQt5.QtCore import QRegExp, QT_VERSION_STR
 from PyQt5.QtGui import QIcon, QRegExpValidator, QColor
 from PyQt5.QtWidgets import QPushButton, QAction, QMenu
+from libs.geometry import boundingStats, cropImages
+from libs.metrics import metrics
 from libs.ustr import ustr
 
 __dir__ = os.path.dirname(os.path.abspath(__file__))  # 获取本程序文件路径
@@ -126,65 +127,53 @@ def natural_sort(list, key=lambda s: s):
     Sort the list into natural alphanumeric order.
     """
 
+    digits = re.compile("([0-9]+)")
+
     def get_alphanum_key_func(key):
         convert = lambda text: int(text) if text.isdigit() else text
-        return lambda s: [convert(c) for c in re.split("([0-9]+)", key(s))]
+        return lambda s: [convert(c) for c in digits.split(key(s))]
 
     sort_key = get_alphanum_key_func(key)
     list.sort(key=sort_key)
 
 
 def get_rotate_crop_image(img, points):
-    # Use Green's theory to judge clockwise or counterclockwise
-    # author: biyanhua
-    d = 0.0
-    for index in range(-1, 3):
-        d += (
-            -0.5
-            * (points[index + 1][1] + points[index][1])
-            * (points[index + 1][0] - points[index][0])
-        )
-    if d < 0:  # counterclockwise
-        tmp = np.array(points)
-        points[1], points[3] = tmp[3], tmp[1]
-
+    """
+    Perspective crop of one quad, see libs.geometry.cropImages for many.
+    """
     try:
-        img_crop_width = int(
-            max(
-                np.linalg.norm(points[0] - points[1]),
-                np.linalg.norm(points[2] - points[3]),
-            )
-        )
-        img_crop_height = int(
-            max(
-                np.linalg.norm(points[0] - points[3]),
-                np.linalg.norm(points[1] - points[2]),
-            )
-        )
-        pts_std = np.float32(
-            [
-                [0, 0],
-                [img_crop_width, 0],
-                [img_crop_width, img_crop_height],
-                [0, img_crop_height],
-            ]
-        )
-        M = cv2.getPerspectiveTransform(points, pts_std)
-        dst_img = cv2.warpPerspective(
-            img,
-            M,
-            (img_crop_width, img_crop_height),
-            borderMode=cv2.BORDER_REPLICATE,
-            flags=cv2.INTER_CUBIC,
-        )
-        dst_img_height, dst_img_width = dst_img.shape[0:2]
-        if dst_img_height * 1.0 / dst_img_width >= 1.5:
-            dst_img = np.rot90(dst_img)
-        return dst_img
+        # cropImages takes a batch of quads
+        return cropImages(img, np.asarray(points, np.float32)[None])[0]
     except Exception as e:
         print(e)
 
 
+def rec_batches(crops, batch_size=64):
+    """
+    Group crop indices into batches of crops with similar width/height ratio,
+    so that little padding is needed when a batch goes through the recognizer.
+    """
+    order = sorted(
+        range(len(crops)),
+        key=lambda i: crops[i].shape[1] / float(max(crops[i].shape[0], 1)),
+    )
+    return [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def recognize_crops(ocr, crops, batch_size=64, cls=True):
+    """
+    Recognize a list of crops with PaddleOCR in width bucketed batches.
+    Returns one (text, score) per crop, in the order of the crops.
+    """
+    results = [("", 0.0)] * len(crops)
+    for batch in rec_batches(crops, batch_size):
+        with metrics.timed("ocr.recBatch"):
+            recs = ocr.ocr([crops[i] for i in batch], det=False, cls=cls)[0] or []
+        for i, rec in zip(batch, recs):
+            results[i] = rec
+    return results
+
+
 def boxPad(box, imgShape, pad: int) -> np.array:
     """
     Pad a box with [pad] pixels on each side.
@@ -370,30 +359,8 @@ def polygon_bounding_box_center_and_area(points):
     if len(points) < 3:
         raise ValueError("At least three points are required to form a polygon")
 
-    area = 0
-    min_x = float("inf")
-    max_x = float("-inf")
-    min_y = float("inf")
-    max_y = float("-inf")
-
-    n = len(points)
-    for i in range(n):
-        x1 = points[i].x()
-        y1 = points[i].y()
-        x2 = points[(i + 1) % n].x()
-        y2 = points[(i + 1) % n].y()
-        area += x1 * y2 - x2 * y1
-
-        min_x = min(min_x, x1)
-        max_x = max(max_x, x1)
-        min_y = min(min_y, y1)
-        max_y = max(max_y, y1)
-
-    area = abs(area) / 2.0
-    center_x = (min_x + max_x) / 2
-    center_y = (min_y + max_y) / 2
-
-    return center_x, center_y, area
+    center_x, center_y, area = boundingStats([[(p.x(), p.y()) for p in points]])
+    return float(center_x[0]), float(center_y[0]), float(area[0])
 
 
 def map_value(x, in_min, in_max, out_min, out_max):
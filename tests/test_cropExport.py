@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from libs.cropExport import CROP_DIR, MANIFEST_NAME, STAGING_NAME, CropExport
+
+
+def snapshot(folder):
+    """Names and contents of every file below ``folder``."""
+    files = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, folder)] = f.read()
+    return files
+
+
+class CropExportTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.baseDir = os.path.join(self.root, "images")
+        os.makedirs(self.baseDir)
+        rng = np.random.RandomState(0)
+        self.labels = {}
+        for n in range(3):
+            cv2.imwrite(
+                os.path.join(self.baseDir, "img%d.png" % n),
+                rng.randint(0, 255, (120, 200, 3), np.uint8),
+            )
+            self.labels["images/img%d.png" % n] = [
+                {
+                    "transcription": "text%d_%d" % (n, i),
+                    "points": [
+                        [10, 10 + 30 * i],
+                        [150, 10 + 30 * i],
+                        [150, 35 + 30 * i],
+                        [10, 35 + 30 * i],
+                    ],
+                    "difficult": False,
+                }
+                for i in range(3)
+            ]
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def export(self, **kwargs):
+        export = CropExport(self.baseDir, self.labels, list(self.labels), workers=1)
+        return export, export.run(**kwargs)
+
+    def testCancelLeavesTheExportUntouched(self):
+        self.export()
+        before = snapshot(self.baseDir)
+        self.labels["images/img1.png"] = self.labels["images/img1.png"][:1]
+        self.labels["images/img0.png"][0]["transcription"] = "changed"
+        _, finished = self.export(progress=lambda done: False)
+        self.assertFalse(finished)
+        self.assertEqual(snapshot(self.baseDir), before)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.baseDir, CROP_DIR, STAGING_NAME))
+        )
+
+    def testOnlyChangedImagesAreExportedAgain(self):
+        export, _ = self.export()
+        self.assertEqual(export.exported, 3)
+        self.labels["images/img1.png"] = self.labels["images/img1.png"][:1]
+        export, finished = self.export()
+        self.assertTrue(finished)
+        self.assertEqual(export.exported, 1)
+        crops = sorted(os.listdir(os.path.join(self.baseDir, CROP_DIR)))
+        self.assertNotIn("img1_crop_1.jpg", crops)
+        self.assertNotIn("img1_crop_2.jpg", crops)
+        self.assertEqual(len(crops), 7 + 1)  # and the manifest
+        self.assertIn(MANIFEST_NAME, crops)
+        with open(os.path.join(self.baseDir, "rec_gt.txt"), encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
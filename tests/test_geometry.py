@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from libs.cropExport import exportImage
+from libs.geometry import cropImages, cropPolygons, fixOrientation, minAreaQuads
+from libs.utils import get_rotate_crop_image
+
+
+def polygon(x, y, w, h, points):
+    """A text line polygon: ``points // 2`` along the top, then back along the bottom."""
+    half = points // 2
+    top = [[x + w * i / (half - 1), y] for i in range(half)]
+    bottom = [[x + w * i / (half - 1), y + h] for i in reversed(range(half))]
+    return top + bottom
+
+
+class GeometryTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.img = rng.randint(0, 255, (300, 400, 3), np.uint8)
+
+    def testPolygonsAreNotReshapedIntoQuads(self):
+        polys = np.array([polygon(10, 10, 100, 20, 8), polygon(10, 60, 80, 30, 8)])
+        with self.assertRaises(ValueError):
+            fixOrientation(polys)
+        with self.assertRaises(ValueError):
+            cropImages(self.img, polys)
+
+    def testEightPointPolygons(self):
+        polys = [polygon(10, 10, 100, 20, 8), polygon(10, 60, 80, 30, 8)]
+        crops = cropPolygons(self.img, polys)
+        self.assertEqual(len(crops), 2)
+        expected = cropImages(self.img, np.array(minAreaQuads(polys), np.float32))
+        for crop, want in zip(crops, expected):
+            np.testing.assert_array_equal(crop, want)
+
+    def testMixedPolygonLengths(self):
+        quad = polygon(10, 10, 100, 20, 4)
+        polys = [quad, polygon(10, 60, 80, 30, 8), [[0, 0], [10, 0], [10, 10]]]
+        crops = cropPolygons(self.img, polys)
+        self.assertEqual(len(crops), 3)
+        np.testing.assert_array_equal(
+            crops[0], cropImages(self.img, np.array([quad], np.float32))[0]
+        )
+        self.assertEqual(crops[1].shape[:2], (30, 80))
+        self.assertIsNone(crops[2])
+
+    def testSingleQuadCrop(self):
+        quad = np.array([[20, 30], [140, 40], [135, 70], [15, 60]], np.float32)
+        crop = get_rotate_crop_image(self.img, quad)
+        self.assertIsNotNone(crop)
+        # as cv2 crops it on its own
+        edges = np.linalg.norm(quad - np.roll(quad, -1, axis=0), axis=1)
+        width = int(max(edges[0], edges[2]))
+        height = int(max(edges[1], edges[3]))
+        m = cv2.getPerspectiveTransform(
+            quad, np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+        )
+        want = cv2.warpPerspective(
+            self.img,
+            m,
+            (width, height),
+            borderMode=cv2.BORDER_REPLICATE,
+            flags=cv2.INTER_CUBIC,
+        )
+        self.assertEqual(crop.shape, want.shape)
+        self.assertLessEqual(np.abs(crop.astype(int) - want).max(), 1)
+        # point lists as the canvas gives them work too
+        np.testing.assert_array_equal(
+            get_rotate_crop_image(self.img, quad.tolist()), crop
+        )
+
+    def testExportKeepsCropsWithTheirLabels(self):
+        folder = tempfile.mkdtemp()
+        try:
+            imgPath = os.path.join(folder, "img.png")
+            cv2.imwrite(imgPath, self.img)
+            labels = [
+                {"points": polygon(10, 10, 100, 20, 8), "difficult": False},
+                {"points": [[0, 0], [10, 0], [10, 10]], "difficult": False},
+                {"points": polygon(10, 60, 80, 30, 6), "difficult": False},
+            ]
+            written, bad = exportImage(imgPath, "dir/img.png", labels, folder)
+            self.assertEqual(written, ["img_crop_0.jpg", "img_crop_2.jpg"])
+            self.assertEqual(bad, ["img_crop_1.jpg"])
+            crop = cv2.imread(os.path.join(folder, "img_crop_2.jpg"))
+            self.assertEqual(crop.shape[:2], (30, 80))
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    unittest.main()
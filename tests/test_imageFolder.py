@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from libs.autoRecEngine import RunJournal
+from libs.cropExport import CropExport
+from libs.imageFolder import (
+    _STAMP,
+    _STAMP_SIZE,
+    _dirMtime,
+    _restamp,
+    keepListing,
+    listingPath,
+)
+from libs.labelStore import loadLabelFile
+
+
+class KeepListingTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.folder = os.path.join(self.root, "images")
+        os.makedirs(self.folder)
+        cv2.imwrite(
+            os.path.join(self.folder, "img0.png"), np.zeros((60, 80, 3), np.uint8)
+        )
+        # as saveListing writes it
+        with open(listingPath(self.folder), "wb") as f:
+            f.write((_STAMP % 0).encode("ascii"))
+        _restamp(self.folder, 0, _dirMtime(self.folder))
+        self.assertTrue(self.listingValid())
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def listingValid(self):
+        with open(listingPath(self.folder), "rb") as f:
+            return int(f.read(_STAMP_SIZE)) == _dirMtime(self.folder)
+
+    def testOwnWritesKeepTheListing(self):
+        with keepListing(self.folder):
+            open(os.path.join(self.folder, "fileState.txt"), "w").close()
+        self.assertTrue(self.listingValid())
+
+    def testStaleListingStaysStale(self):
+        open(os.path.join(self.folder, "img1.png"), "w").close()
+        with keepListing(self.folder):
+            open(os.path.join(self.folder, "fileState.txt"), "w").close()
+        self.assertFalse(self.listingValid())
+
+    def testLabelFilesKeepTheListing(self):
+        labelPath = os.path.join(self.folder, "Label.txt")
+        # created empty, then its index is written
+        loadLabelFile(labelPath)
+        labels = loadLabelFile(labelPath)
+        labels["images/img0.png"] = [
+            {
+                "transcription": "text",
+                "points": [[10, 10], [60, 10], [60, 40], [10, 40]],
+                "difficult": False,
+            }
+        ]
+        with keepListing(self.folder):
+            labels.save(labelPath)
+        loadLabelFile(labelPath)
+        self.assertTrue(self.listingValid())
+
+        journal = RunJournal(os.path.join(self.folder, "Cache.cach"))
+        journal.record(["images/img0.png"])
+        journal.finish()
+        self.assertTrue(self.listingValid())
+
+        export = CropExport(self.folder, labels, ["images/img0.png"], workers=1)
+        self.assertTrue(export.run())
+        self.assertEqual(export.crops, 1)
+        self.assertTrue(self.listingValid())
+
+
+if __name__ == "__main__":
+    unittest.main()
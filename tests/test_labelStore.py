@@ -0,0 +1,179 @@
+import gc
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from libs.labelStore import (
+    LabelJournal,
+    _RawEntry,
+    _indexPath,
+    _readIndex,
+    loadLabelFile,
+)
+
+
+def box(text):
+    return [{"transcription": text, "points": [[0, 0], [9, 0], [9, 9], [0, 9]]}]
+
+
+class LabelStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "Label.txt")
+        with open(self.path, "w", encoding="utf-8") as f:
+            for n in range(3):
+                f.write("images/img%d.jpg\t%s\n" % (n, json.dumps(box("text%d" % n))))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def testSaveRebindsUnparsedEntries(self):
+        labels = loadLabelFile(self.path)
+        copy = labels.copy()
+        # the entries after img0 move to other offsets
+        del copy["images/img0.jpg"]
+        copy["images/new.jpg"] = box("a much longer transcription than before")
+        copy.save(self.path)
+
+        for d in (labels, copy):
+            entry = d._data["images/img2.jpg"]
+            self.assertIsInstance(entry, _RawEntry)
+            self.assertEqual(entry.source.path, self.path)
+            self.assertIsNone(entry.data)
+        self.assertEqual(labels["images/img2.jpg"], box("text2"))
+        self.assertEqual(copy["images/img1.jpg"], box("text1"))
+        # img0 is not in the new file, the entry still holds its bytes
+        self.assertEqual(labels["images/img0.jpg"], box("text0"))
+        self.assertEqual(
+            list(loadLabelFile(self.path).items()),
+            [
+                ("images/img1.jpg", box("text1")),
+                ("images/img2.jpg", box("text2")),
+                ("images/new.jpg", box("a much longer transcription than before")),
+            ],
+        )
+
+    def testFileIsClosedWithItsEntries(self):
+        labels = loadLabelFile(self.path)
+        copy = labels.copy()
+        self.assertEqual(labels["images/img0.jpg"], box("text0"))
+        f = copy._data["images/img1.jpg"].source._file
+        self.assertFalse(f.closed)
+        del labels
+        gc.collect()
+        self.assertFalse(f.closed)
+        for n in range(3):
+            self.assertEqual(copy["images/img%d.jpg" % n], box("text%d" % n))
+        # every entry is parsed, nothing reads the file any more
+        gc.collect()
+        self.assertTrue(f.closed)
+
+    def testStaleIndexIsNotUsed(self):
+        loadLabelFile(self.path)
+        self.assertIsNotNone(_readIndex(self.path))
+        st = os.stat(self.path)
+
+        # same size, other content and mtime
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("images/img9.jpg\t%s\n" % json.dumps(box("text0")))
+            f.write("images/img1.jpg\t%s\n" % json.dumps(box("text1")))
+            f.write("images/img2.jpg\t%s\n" % json.dumps(box("text2")))
+        self.assertEqual(os.path.getsize(self.path), st.st_size)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertIsNone(_readIndex(self.path))
+        labels = loadLabelFile(self.path)
+        self.assertEqual(
+            list(labels), ["images/img9.jpg", "images/img1.jpg", "images/img2.jpg"]
+        )
+
+        # other size, same mtime
+        st = os.stat(self.path)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("images/img3.jpg\t%s\n" % json.dumps(box("text3")))
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertIsNone(_readIndex(self.path))
+        labels = loadLabelFile(self.path)
+        self.assertEqual(labels["images/img3.jpg"], box("text3"))
+        self.assertEqual(len(_readIndex(self.path)), 4)
+
+    def testIndexWithoutLabelFileIsIgnored(self):
+        loadLabelFile(self.path)
+        os.remove(self.path)
+        self.assertTrue(os.path.exists(_indexPath(self.path)))
+        self.assertEqual(len(loadLabelFile(self.path)), 0)
+
+
+class LabelJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.journal = LabelJournal(os.path.join(self.root, "Label.txt"))
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.root)
+
+    def replay(self):
+        labels, states = {}, {}
+        count = LabelJournal(self.journal.path[: -len(LabelJournal.SUFFIX)]).replay(
+            labels, states
+        )
+        return count, labels, states
+
+    def testReplaySkipsTornLastRecord(self):
+        self.journal.append("images/img0.jpg", box("text0"))
+        self.journal.append("images/img1.jpg", box("text1"), state=0)
+        self.journal.remove("images/img0.jpg")
+        self.journal.close()
+        with open(self.journal.path, "ab") as f:
+            f.write(b'{"key": "images/img2.jpg", "label": [{"transcr')
+
+        count, labels, states = self.replay()
+        self.assertEqual(count, 3)
+        self.assertEqual(labels, {"images/img1.jpg": box("text1")})
+        self.assertEqual(states, {"images/img1.jpg": 0})
+
+    def testAppendWhileCompacting(self):
+        self.journal.append("images/img0.jpg", box("text0"))
+        started = threading.Event()
+        release = threading.Event()
+        snapshots = []
+
+        def writeSnapshot():
+            started.set()
+            release.wait(5)
+            snapshots.append(True)
+
+        self.journal.compact(writeSnapshot, background=True)
+        self.assertTrue(started.wait(5))
+        # the rotated record waits for the snapshot, the new one goes to a new log
+        self.journal.append("images/img1.jpg", box("text1"))
+        self.assertTrue(os.path.exists(self.journal.oldPath))
+        self.assertEqual(self.replay()[0], 2)
+
+        release.set()
+        self.journal.wait()
+        self.assertEqual(snapshots, [True])
+        self.assertFalse(os.path.exists(self.journal.oldPath))
+        count, labels, _ = self.replay()
+        self.assertEqual(count, 1)
+        self.assertEqual(labels, {"images/img1.jpg": box("text1")})
+
+    def testFailedCompactionKeepsRecords(self):
+        self.journal.append("images/img0.jpg", box("text0"))
+
+        def failingSnapshot():
+            raise OSError("disk full")
+
+        self.journal.compact(failingSnapshot)
+        self.journal.append("images/img1.jpg", box("text1"))
+        self.assertEqual(self.replay()[0], 2)
+        # the next compaction folds the records of both
+        self.journal.compact(lambda: None)
+        self.assertFalse(self.journal.pending())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs.thumbnails import ThumbnailService
+
+
+class ThumbnailCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir)
+
+    def writeThumbnail(self, key, size, mtime):
+        path = os.path.join(self.cacheDir, key[:2], key + ".jpg")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def testPruneDeletesLeastRecentlyUsed(self):
+        paths = [
+            self.writeThumbnail("%02x%s" % (n, "0" * 38), 1000, 1000000 + n)
+            for n in range(10)
+        ]
+        service = ThumbnailService(cacheDir=self.cacheDir, cacheBytes=10000)
+        service.close(wait=True)
+        # fits the cap, nothing to do
+        self.assertEqual(service.pruneCache(), 0)
+
+        # pruned on startup, down to 90% of the cap
+        service = ThumbnailService(cacheDir=self.cacheDir, cacheBytes=5000)
+        service.close(wait=True)
+        self.assertEqual(
+            [os.path.exists(path) for path in paths], [False] * 6 + [True] * 4
+        )
+        self.assertEqual(service.pruneCache(), 0)
+
+    def testPruneWithoutCacheFolder(self):
+        service = ThumbnailService(
+            cacheDir=os.path.join(self.cacheDir, "missing"), cacheBytes=0
+        )
+        service.close(wait=True)
+        self.assertEqual(service.pruneCache(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()